@@ -0,0 +1,90 @@
+"""Seasonal archival of finished reservations
+
+Stays that departed more than ARCHIVE_AFTER_MONTHS months ago (paid, completed
+or cancelled) are moved, in batches, from `reservations` into
+`reservations_archive`. Availability checks only ever query the live table, so
+it stays the size of the current season; admin search and exports read both
+tables through fetch_reservations().
+"""
+from datetime import date, datetime
+
+from sqlalchemy import DateTime, delete, func, insert, literal, select, update
+
+from models import db, ArchivedReservation, Reservation, WaitlistEntry
+
+# Only these statuses are archived; pending holds always stay live. Paid stays
+# stay `confirmed` after departure, so they are archived with that status
+ARCHIVED_STATUSES = ('confirmed', 'completed', 'cancelled')
+
+# Rows moved per transaction, so archiving never holds long locks on the live table
+ARCHIVE_BATCH_SIZE = 1000
+
+RESERVATION_COLUMNS = [column.name for column in Reservation.__table__.columns]
+
+
+def archive_cutoff(months, today=None):
+    """First day of the month `months` months before today"""
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def archive_reservations(months, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move finished reservations that departed before the cutoff; returns the count moved.
+
+    Each batch is copied and deleted in its own transaction. Waitlist entries
+    that pointed at an archived offer keep their status but lose the link.
+    """
+    cutoff = archive_cutoff(months)
+    # SQLite reuses the highest rowid after a delete, so never archive the newest
+    # reservation or a new booking could take an archived confirmation code
+    newest_id = select(func.max(Reservation.id)).scalar_subquery()
+    candidates = select(Reservation.id).where(
+        Reservation.status.in_(ARCHIVED_STATUSES),
+        Reservation.departure_date < cutoff,
+        Reservation.id < newest_id
+    ).order_by(Reservation.id).limit(batch_size)
+
+    now = datetime.utcnow()
+    moved = 0
+    while True:
+        ids = db.session.execute(candidates).scalars().all()
+        if not ids:
+            break
+
+        db.session.execute(
+            insert(ArchivedReservation).from_select(
+                RESERVATION_COLUMNS + ['archived_at'],
+                select(
+                    *[Reservation.__table__.c[name] for name in RESERVATION_COLUMNS],
+                    literal(now, DateTime)
+                ).where(Reservation.id.in_(ids))
+            )
+        )
+        db.session.execute(
+            update(WaitlistEntry).where(WaitlistEntry.offered_reservation_id.in_(ids))
+            .values(offered_reservation_id=None),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.execute(
+            delete(Reservation).where(Reservation.id.in_(ids)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        moved += len(ids)
+
+    return moved
+
+
+def fetch_reservations(build_query, key, reverse=False, status=None, limit=None, archive=True):
+    """Run build_query(model) on the live and archive tables and merge the rows.
+
+    build_query receives Reservation or ArchivedReservation and returns a query
+    with its filters, ordering and limit applied. The archive is skipped when
+    archive is false or a status filter can only match live reservations.
+    """
+    rows = build_query(Reservation).all()
+    if archive and (not status or status in ARCHIVED_STATUSES):
+        rows += build_query(ArchivedReservation).all()
+    rows.sort(key=key, reverse=reverse)
+    return rows[:limit] if limit else rows
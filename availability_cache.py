@@ -0,0 +1,411 @@
+"""Per-site availability cache shared by all gunicorn workers
+
+Each site's upcoming reservations and blocks are cached as a sorted list of
+merged [start, end) day intervals, tagged with the site's version number.
+Writes bump the version of the sites they touch, so a cached entry is only used
+while its version still matches. Availability checks are then a binary search
+instead of a database query. The same store carries the short availability event
+log that availability_stream.py fans out to browsers.
+
+AVAILABILITY_CACHE_URL selects the shared store:
+    sqlite:///path/to/file.db   a SQLite file shared by workers on one host
+                                (the default, kept in the instance folder)
+    redis://host:6379/0         a Redis-compatible server (needs `redis`)
+    memory://                   a per-process dict, for development
+"""
+import bisect
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from flask import current_app
+from sqlalchemy import or_, select
+
+import metrics
+from events import availability_changed
+from models import db, ACTIVE_STATUSES, BlockedDate, Reservation, Site
+
+EXTENSION_KEY = 'availability_cache'
+
+# Events older than this are pruned from the log; streams reconnect well within it
+EVENT_RETENTION_SECONDS = 3600
+
+metrics.describe('availability_cache_requests_total', 'Availability cache lookups by result')
+metrics.describe('availability_cache_invalidations_total', 'Site versions bumped by writes')
+metrics.describe('availability_cache_entry_age_seconds', 'Age of cache entries when served', 'summary')
+
+
+class MemoryBackend:
+    """Process-local store; only suitable for a single worker"""
+
+    EVENT_ID_RE = re.compile(r'^\d{1,18}$')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._entries = {}
+        self._events = []
+        self._event_seq = 0
+
+    def get(self, site_ids):
+        with self._lock:
+            return {
+                site_id: (self._versions.get(site_id, 0), self._entries.get(site_id))
+                for site_id in site_ids
+            }
+
+    def put(self, site_id, version, built_at, intervals):
+        with self._lock:
+            self._entries[site_id] = (version, built_at, intervals)
+
+    def versions(self, site_ids):
+        with self._lock:
+            return {site_id: self._versions.get(site_id, 0) for site_id in site_ids}
+
+    def bump(self, site_ids):
+        with self._lock:
+            for site_id in site_ids:
+                self._versions[site_id] = self._versions.get(site_id, 0) + 1
+
+    def append_event(self, channel, payload):
+        with self._lock:
+            self._event_seq += 1
+            cutoff = time.time() - EVENT_RETENTION_SECONDS
+            self._events = [event for event in self._events if event[2] >= cutoff]
+            self._events.append((self._event_seq, channel, time.time(), payload))
+
+    def latest_event_id(self, channel):
+        with self._lock:
+            return str(self._event_seq)
+
+    def read_events(self, channel, after_id):
+        after = int(after_id or 0)
+        with self._lock:
+            return [
+                (str(seq), payload)
+                for seq, event_channel, created_at, payload in self._events
+                if event_channel == channel and seq > after
+            ]
+
+
+class SQLiteBackend:
+    """Store in a SQLite file (WAL mode) shared by every worker on the host"""
+
+    EVENT_ID_RE = re.compile(r'^\d{1,18}$')
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS site_availability ("
+                "site_id INTEGER PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0, "
+                "cached_version INTEGER, built_at REAL, intervals TEXT)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS availability_events ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+                "created_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_availability_events_channel "
+                "ON availability_events (channel, seq)"
+            )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, site_ids):
+        site_ids = list(site_ids)
+        placeholders = ','.join('?' * len(site_ids))
+        rows = self._connection().execute(
+            "SELECT site_id, version, cached_version, built_at, intervals "
+            f"FROM site_availability WHERE site_id IN ({placeholders})",
+            site_ids
+        ).fetchall()
+
+        found = {
+            site_id: (version, (cached_version, built_at, json.loads(intervals)) if intervals else None)
+            for site_id, version, cached_version, built_at, intervals in rows
+        }
+        return {site_id: found.get(site_id, (0, None)) for site_id in site_ids}
+
+    def put(self, site_id, version, built_at, intervals):
+        self._connection().execute(
+            "INSERT INTO site_availability (site_id, cached_version, built_at, intervals) "
+            "VALUES (?, ?, ?, ?) ON CONFLICT (site_id) DO UPDATE SET "
+            "cached_version = excluded.cached_version, built_at = excluded.built_at, "
+            "intervals = excluded.intervals",
+            (site_id, version, built_at, json.dumps(intervals))
+        )
+
+    def versions(self, site_ids):
+        site_ids = list(site_ids)
+        placeholders = ','.join('?' * len(site_ids))
+        found = dict(self._connection().execute(
+            f"SELECT site_id, version FROM site_availability WHERE site_id IN ({placeholders})",
+            site_ids
+        ).fetchall())
+        return {site_id: found.get(site_id, 0) for site_id in site_ids}
+
+    def bump(self, site_ids):
+        self._connection().executemany(
+            "INSERT INTO site_availability (site_id, version) VALUES (?, 1) "
+            "ON CONFLICT (site_id) DO UPDATE SET version = version + 1",
+            [(site_id,) for site_id in site_ids]
+        )
+
+    def append_event(self, channel, payload):
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT INTO availability_events (channel, created_at, payload) VALUES (?, ?, ?)",
+            (channel, now, payload)
+        )
+        conn.execute(
+            "DELETE FROM availability_events WHERE created_at < ?",
+            (now - EVENT_RETENTION_SECONDS,)
+        )
+
+    def latest_event_id(self, channel):
+        row = self._connection().execute("SELECT max(seq) FROM availability_events").fetchone()
+        return str(row[0] or 0)
+
+    def read_events(self, channel, after_id):
+        rows = self._connection().execute(
+            "SELECT seq, payload FROM availability_events WHERE channel = ? AND seq > ? ORDER BY seq",
+            (channel, int(after_id or 0))
+        ).fetchall()
+        return [(str(seq), payload) for seq, payload in rows]
+
+
+class RedisBackend:
+    """Store in a Redis-compatible server shared by every worker and host"""
+
+    # Stream entry ids: milliseconds-sequence
+    EVENT_ID_RE = re.compile(r'^\d{1,20}-\d{1,20}$')
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for this backend
+
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, site_ids):
+        site_ids = list(site_ids)
+        keys = [f'availability:version:{site_id}' for site_id in site_ids]
+        keys += [f'availability:entry:{site_id}' for site_id in site_ids]
+        values = self._client.mget(keys)
+
+        result = {}
+        for index, site_id in enumerate(site_ids):
+            version = int(values[index] or 0)
+            entry = values[len(site_ids) + index]
+            result[site_id] = (version, tuple(json.loads(entry)) if entry else None)
+        return result
+
+    def put(self, site_id, version, built_at, intervals):
+        self._client.set(
+            f'availability:entry:{site_id}',
+            json.dumps([version, built_at, intervals]),
+            ex=current_app.config['AVAILABILITY_CACHE_TTL'] * 2
+        )
+
+    def versions(self, site_ids):
+        site_ids = list(site_ids)
+        values = self._client.mget([f'availability:version:{site_id}' for site_id in site_ids])
+        return {site_id: int(value or 0) for site_id, value in zip(site_ids, values)}
+
+    def bump(self, site_ids):
+        pipe = self._client.pipeline(transaction=False)
+        for site_id in site_ids:
+            pipe.incr(f'availability:version:{site_id}')
+        pipe.execute()
+
+    def append_event(self, channel, payload):
+        self._client.xadd(
+            f'availability:events:{channel}', {'payload': payload}, maxlen=1000, approximate=True
+        )
+
+    def latest_event_id(self, channel):
+        latest = self._client.xrevrange(f'availability:events:{channel}', count=1)
+        return latest[0][0].decode() if latest else '0-0'
+
+    def read_events(self, channel, after_id):
+        entries = self._client.xrange(f'availability:events:{channel}', min=f'({after_id or "0-0"}')
+        return [(entry_id.decode(), fields[b'payload'].decode()) for entry_id, fields in entries]
+
+
+def create_backend(url, instance_path):
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        return RedisBackend(url)
+    if url.startswith('memory://'):
+        return MemoryBackend()
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+
+    os.makedirs(instance_path, exist_ok=True)
+    return SQLiteBackend(os.path.join(instance_path, 'availability-cache.db'))
+
+
+def get_backend():
+    """Return this process's backend, creating it on first use (after fork)"""
+    state = current_app.extensions[EXTENSION_KEY]
+    if state['backend'] is None:
+        with state['lock']:
+            if state['backend'] is None:
+                state['backend'] = create_backend(
+                    current_app.config['AVAILABILITY_CACHE_URL'], current_app.instance_path
+                )
+    return state['backend']
+
+
+def _merge(intervals):
+    """Sort and merge overlapping [start, end) intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def load_intervals(site_ids):
+    """Read booked and blocked day intervals for sites from the primary database.
+
+    Cache fills never use the read replica, so a lagging replica can't be cached
+    under a version that already includes a newer write.
+    """
+    today = date.today()
+    primary = {'bind': db.engine}
+    intervals = {site_id: [] for site_id in site_ids}
+
+    reservations = db.session.execute(
+        select(Reservation.site_id, Reservation.arrival_date, Reservation.departure_date).where(
+            Reservation.site_id.in_(site_ids),
+            Reservation.status.in_(ACTIVE_STATUSES),
+            Reservation.departure_date > today
+        ),
+        bind_arguments=primary
+    ).all()
+    for row in reservations:
+        intervals[row.site_id].append((row.arrival_date.toordinal(), row.departure_date.toordinal()))
+
+    campgrounds = dict(db.session.execute(
+        select(Site.id, Site.campground_id).where(Site.id.in_(site_ids)),
+        bind_arguments=primary
+    ).all())
+    blocks = db.session.execute(
+        select(BlockedDate.site_id, BlockedDate.campground_id, BlockedDate.start_date, BlockedDate.end_date).where(
+            or_(
+                BlockedDate.site_id.in_(site_ids),
+                BlockedDate.site_id.is_(None) & BlockedDate.campground_id.in_(set(campgrounds.values())),
+                BlockedDate.site_id.is_(None) & BlockedDate.campground_id.is_(None)
+            ),
+            BlockedDate.end_date >= today
+        ),
+        bind_arguments=primary
+    ).all()
+    for block in blocks:
+        # Blocks include their end_date night; intervals are end-exclusive
+        interval = (block.start_date.toordinal(), (block.end_date + timedelta(days=1)).toordinal())
+        if block.site_id is not None:
+            intervals[block.site_id].append(interval)
+        else:
+            for site_id, campground_id in campgrounds.items():
+                if block.campground_id in (None, campground_id):
+                    intervals[site_id].append(interval)
+
+    return {site_id: _merge(site_intervals) for site_id, site_intervals in intervals.items()}
+
+
+def get_intervals(site_ids):
+    """Return merged booked intervals per site, from the cache where still valid"""
+    backend = get_backend()
+    ttl = current_app.config['AVAILABILITY_CACHE_TTL']
+    now = time.time()
+
+    cached = backend.get(site_ids)
+    result = {}
+    missing = {}
+
+    for site_id, (version, entry) in cached.items():
+        if entry is None:
+            metrics.inc('availability_cache_requests_total', result='miss')
+            missing[site_id] = version
+        elif entry[0] != version:
+            metrics.inc('availability_cache_requests_total', result='stale')
+            missing[site_id] = version
+        elif now - entry[1] > ttl:
+            metrics.inc('availability_cache_requests_total', result='expired')
+            missing[site_id] = version
+        else:
+            metrics.inc('availability_cache_requests_total', result='hit')
+            metrics.observe('availability_cache_entry_age_seconds', now - entry[1])
+            result[site_id] = entry[2]
+
+    if missing:
+        loaded = load_intervals(list(missing))
+        for site_id, intervals in loaded.items():
+            # Tag with the version read before loading; a concurrent bump makes it stale
+            backend.put(site_id, missing[site_id], now, intervals)
+            result[site_id] = intervals
+
+    return result
+
+
+def is_free(intervals, arrival_date, departure_date):
+    """Binary search merged intervals for an overlap with [arrival, departure)"""
+    arrival = arrival_date.toordinal()
+    departure = departure_date.toordinal()
+    index = bisect.bisect_left(intervals, [departure]) - 1
+    return index < 0 or intervals[index][1] <= arrival
+
+
+def check_availability(site_ids, arrival_date, departure_date):
+    """Return {site_id: available} for several sites with one cache round trip"""
+    intervals = get_intervals(site_ids)
+    return {
+        site_id: is_free(site_intervals, arrival_date, departure_date)
+        for site_id, site_intervals in intervals.items()
+    }
+
+
+def is_site_available(site, arrival_date, departure_date):
+    """Cached equivalent of Site.is_available for read-only pages"""
+    return check_availability([site.id], arrival_date, departure_date)[site.id]
+
+
+def site_versions(site_ids):
+    """Write counters per site, bumped after every committed availability change"""
+    site_ids = list(site_ids)
+    return get_backend().versions(site_ids) if site_ids else {}
+
+
+def invalidate_sites(site_ids):
+    site_ids = sorted(set(site_ids))
+    if site_ids:
+        get_backend().bump(site_ids)
+        metrics.inc('availability_cache_invalidations_total', len(site_ids))
+
+
+def _on_availability_changed(app, changes):
+    invalidate_sites(change.site_id for change in changes)
+
+
+def init_app(app):
+    """Register the cache with an app; the backend connects lazily per process"""
+    app.config.setdefault('AVAILABILITY_CACHE_URL', '')
+    app.config.setdefault('AVAILABILITY_CACHE_TTL', 300)
+    app.extensions[EXTENSION_KEY] = {'backend': None, 'lock': threading.Lock()}
+    availability_changed.connect(_on_availability_changed, app)
@@ -0,0 +1,131 @@
+"""Server-Sent Events stream of availability changes per campground
+
+Committed availability changes are appended to a per-campground event log in
+the shared availability store, so every gunicorn worker can serve any browser.
+Each stream polls that log (a cheap indexed read) and pushes compact deltas;
+streams end after AVAILABILITY_STREAM_SECONDS and the browser's EventSource
+reconnects with Last-Event-ID, so no events are missed.
+
+Streams hold a worker thread while open, so each worker serves at most
+AVAILABILITY_STREAM_MAX_PER_WORKER of them and answers the rest with a 503 and a
+long retry delay. The Procfile runs gunicorn with more threads than that cap, so
+booking and admin requests always have threads left.
+"""
+import json
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, current_app, request
+
+import availability_cache
+import metrics
+from events import availability_changed
+
+EXTENSION_KEY = 'availability_stream'
+
+KEEPALIVE_SECONDS = 15
+
+# Streams turned away because the worker is full reconnect after this long
+BUSY_RETRY_SECONDS = 30
+
+metrics.describe('availability_stream_events_total', 'Availability deltas published to streams')
+metrics.describe('availability_stream_connections_total', 'Availability stream connections opened')
+metrics.describe('availability_stream_rejections_total', 'Availability streams refused because the worker was full')
+
+
+def _encode(changes):
+    """Encode changes as a compact JSON delta"""
+    return json.dumps({
+        'changes': [
+            {
+                'site_id': change.site_id,
+                'start': change.start_date.isoformat(),
+                'end': change.end_date.isoformat(),
+                'available': change.available
+            }
+            for change in changes
+        ]
+    }, separators=(',', ':'))
+
+
+def _on_availability_changed(app, changes):
+    by_campground = defaultdict(list)
+    for change in changes:
+        by_campground[change.campground_id].append(change)
+
+    backend = availability_cache.get_backend()
+    for campground_id, campground_changes in by_campground.items():
+        backend.append_event(str(campground_id), _encode(campground_changes))
+        metrics.inc('availability_stream_events_total')
+
+
+def busy_response():
+    """A 503 telling the browser to reconnect after BUSY_RETRY_SECONDS"""
+    return Response(f'retry: {BUSY_RETRY_SECONDS * 1000}\n\n', status=503, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'Retry-After': str(BUSY_RETRY_SECONDS)
+    })
+
+
+def stream_response(campground_id):
+    """Build the text/event-stream response for one campground"""
+    slots = current_app.extensions[EXTENSION_KEY]['slots']
+    if not slots.acquire(blocking=False):
+        metrics.inc('availability_stream_rejections_total')
+        return busy_response()
+
+    try:
+        response = _event_stream(campground_id)
+    except Exception:
+        # e.g. the shared store is down; don't leak the slot
+        slots.release()
+        raise
+    # Called by the server when the stream ends or the client goes away
+    response.call_on_close(slots.release)
+    return response
+
+
+def _event_stream(campground_id):
+    backend = availability_cache.get_backend()
+    channel = str(campground_id)
+    last_id = request.headers.get('Last-Event-ID')
+    if not last_id or not backend.EVENT_ID_RE.match(last_id):
+        # Resume only from ids this store hands out; anything else starts from now
+        last_id = backend.latest_event_id(channel)
+    duration = current_app.config['AVAILABILITY_STREAM_SECONDS']
+    poll_interval = current_app.config['AVAILABILITY_STREAM_POLL_SECONDS']
+    metrics.inc('availability_stream_connections_total')
+
+    def generate(last_id):
+        deadline = time.monotonic() + duration
+        last_sent = time.monotonic()
+        yield 'retry: 3000\n\n'
+
+        while time.monotonic() < deadline:
+            events = backend.read_events(channel, last_id)
+            for event_id, payload in events:
+                yield f'id: {event_id}\ndata: {payload}\n\n'
+                last_id = event_id
+                last_sent = time.monotonic()
+
+            if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                yield ': keepalive\n\n'
+                last_sent = time.monotonic()
+
+            time.sleep(poll_interval)
+
+    return Response(generate(last_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+def init_app(app):
+    app.config.setdefault('AVAILABILITY_STREAM_SECONDS', 55)
+    app.config.setdefault('AVAILABILITY_STREAM_POLL_SECONDS', 1.0)
+    app.config.setdefault('AVAILABILITY_STREAM_MAX_PER_WORKER', 16)
+    app.extensions[EXTENSION_KEY] = {
+        'slots': threading.BoundedSemaphore(app.config['AVAILABILITY_STREAM_MAX_PER_WORKER'])
+    }
+    availability_changed.connect(_on_availability_changed, app)
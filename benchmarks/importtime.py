@@ -0,0 +1,56 @@
+"""Measure cold-start import time of the web app and the CLI app
+
+Runs `python -X importtime` in fresh interpreters and reports the cumulative
+import time of each entry point and whether Stripe was imported.
+
+    python benchmarks/importtime.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = {
+    'web (app.create_app)': 'import app',
+    'cli (factory.create_db_app)': 'import factory; factory.create_db_app()',
+}
+
+
+def measure(code):
+    """Return (total_ms, stripe_imported) for one cold interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    total_us = 0
+    stripe_imported = False
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        # Nested imports are indented and already counted in their parent's total
+        if module[1:2] != ' ':
+            total_us += int(cumulative)
+        if module.strip() == 'stripe':
+            stripe_imported = True
+    return total_us / 1000, stripe_imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark application import time')
+    parser.add_argument('--runs', type=int, default=5, help='Interpreters per target (default: 5)')
+    args = parser.parse_args()
+
+    for name, code in TARGETS.items():
+        samples = [measure(code) for _ in range(args.runs)]
+        times = [ms for ms, _ in samples]
+        stripe_imported = any(imported for _, imported in samples)
+        print(f"{name:30} median {statistics.median(times):7.1f} ms  "
+              f"min {min(times):7.1f} ms  stripe imported: {'yes' if stripe_imported else 'no'}")
+
+
+if __name__ == '__main__':
+    main()
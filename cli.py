@@ -0,0 +1,61 @@
+"""Maintenance commands: flask campspots export|seed|sweep|archive
+
+Run with FLASK_APP=cli so only the database layer is set up:
+
+    FLASK_APP=cli flask campspots sweep
+"""
+import click
+from flask.cli import AppGroup
+
+campspots = AppGroup('campspots', help='Campspots maintenance commands.')
+
+
+def create_app():
+    """Lightweight app for the CLI (found by `flask` via FLASK_APP=cli)"""
+    from factory import create_db_app
+
+    return create_db_app()
+
+
+@campspots.command('export')
+@click.option('--format', 'export_format', type=click.Choice(['csv', 'json', 'both']), default='csv',
+              help='Export format (default: csv)')
+@click.option('--output', default='reservations_export', help='Output filename (without extension)')
+def export_command(export_format, output):
+    """Export reservation data for Campspot migration."""
+    from export_data import export_to_csv, export_to_json
+
+    if export_format in ['csv', 'both']:
+        export_to_csv(f"{output}.csv")
+
+    if export_format in ['json', 'both']:
+        export_to_json(f"{output}.json")
+
+
+@campspots.command('seed')
+def seed_command():
+    """Create tables and indexes and load the campground data."""
+    from init_db import init_database
+
+    init_database()
+
+
+@campspots.command('sweep')
+def sweep_command():
+    """Release expired checkout holds and waitlist offers."""
+    from expire_holds import expire_holds
+
+    expire_holds()
+
+
+@campspots.command('archive')
+@click.option('--months', type=int, default=None,
+              help='Archive stays that departed this many months ago (default: ARCHIVE_AFTER_MONTHS)')
+def archive_command(months):
+    """Move reservations that departed long ago to the archive table."""
+    from flask import current_app
+    from archive import archive_cutoff, archive_reservations
+
+    months = current_app.config['ARCHIVE_AFTER_MONTHS'] if months is None else months
+    moved = archive_reservations(months)
+    click.echo(f"Archived {moved} reservation(s) that departed before {archive_cutoff(months)}")
@@ -3,23 +3,84 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-class Config:
-    """Application configuration"""
-    SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    # Handle both postgres:// and postgresql:// URLs
-    # Force psycopg3 driver for PostgreSQL
-    db_url = os.environ.get('DATABASE_URL') or 'sqlite:///campspots.db'
+
+def normalize_database_url(db_url):
+    """Handle both postgres:// and postgresql:// URLs and force the psycopg3 driver"""
     if db_url.startswith('postgres://'):
         db_url = db_url.replace('postgres://', 'postgresql+psycopg://', 1)
     elif db_url.startswith('postgresql://'):
         db_url = db_url.replace('postgresql://', 'postgresql+psycopg://', 1)
-    SQLALCHEMY_DATABASE_URI = db_url
+    return db_url
+
+
+class Config:
+    """Application configuration"""
+    SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
+    SQLALCHEMY_DATABASE_URI = normalize_database_url(os.environ.get('DATABASE_URL') or 'sqlite:///campspots.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Optional read replica for public availability pages
+    replica_url = os.environ.get('DATABASE_REPLICA_URL')
+    SQLALCHEMY_BINDS = {'replica': normalize_database_url(replica_url)} if replica_url else {}
+    # How long a guest who just booked keeps reading from the primary
+    REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 30))
+
     # Stripe Configuration
     STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
     STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY')
 
+    # Pending reservations are held this long while the guest is in Stripe Checkout
+    # (Stripe requires at least 30 minutes)
+    PENDING_HOLD_MINUTES = max(30, int(os.environ.get('PENDING_HOLD_MINUTES', 60)))
+
+    # Waitlist offers hold a freed site this long for the guest to pay
+    WAITLIST_OFFER_MINUTES = int(os.environ.get('WAITLIST_OFFER_MINUTES', 120))
+
+    # Each web worker releases expired holds and offers this often (0 = only via
+    # `flask campspots sweep`)
+    HOLD_SWEEP_SECONDS = int(os.environ.get('HOLD_SWEEP_SECONDS', 60))
+
+    # Confirmed, completed and cancelled reservations that departed this many
+    # months ago are moved to the archive table by `flask campspots archive`
+    ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', 12))
+
+    # Shared availability cache: sqlite:///path, redis://host:port/db or memory://
+    # (defaults to a SQLite file in the instance folder)
+    AVAILABILITY_CACHE_URL = os.environ.get('AVAILABILITY_CACHE_URL', '')
+    AVAILABILITY_CACHE_TTL = int(os.environ.get('AVAILABILITY_CACHE_TTL', 300))
+
+    # Live availability streams end after this many seconds and the browser reconnects
+    AVAILABILITY_STREAM_SECONDS = int(os.environ.get('AVAILABILITY_STREAM_SECONDS', 55))
+    AVAILABILITY_STREAM_POLL_SECONDS = float(os.environ.get('AVAILABILITY_STREAM_POLL_SECONDS', 1.0))
+    # Open streams per worker; keep it well below gunicorn's --threads (see Procfile)
+    AVAILABILITY_STREAM_MAX_PER_WORKER = int(os.environ.get('AVAILABILITY_STREAM_MAX_PER_WORKER', 16))
+
+    # Token-bucket limits ("count/second|minute|hour") per client IP and per browser
+    # session; RATE_LIMIT_URL is memory:// (per worker) or redis://host:port/db
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() != 'false'
+    RATE_LIMIT_URL = os.environ.get('RATE_LIMIT_URL', 'memory://')
+    RATE_LIMIT_AVAILABILITY_IP = os.environ.get('RATE_LIMIT_AVAILABILITY_IP', '300/minute')
+    RATE_LIMIT_AVAILABILITY_SESSION = os.environ.get('RATE_LIMIT_AVAILABILITY_SESSION', '120/minute')
+    RATE_LIMIT_BOOKING_IP = os.environ.get('RATE_LIMIT_BOOKING_IP', '30/minute')
+    RATE_LIMIT_BOOKING_SESSION = os.environ.get('RATE_LIMIT_BOOKING_SESSION', '5/minute')
+
+    # Booking POSTs processed at once per worker (the rest get a 429)
+    BOOKING_CONCURRENCY = int(os.environ.get('BOOKING_CONCURRENCY', 4))
+
+    # Reverse proxies in front of the app, so client IPs come from X-Forwarded-For.
+    # Railway and Render put one proxy in front of every app; elsewhere the default is none
+    TRUSTED_PROXY_COUNT = int(os.environ.get(
+        'TRUSTED_PROXY_COUNT', 1 if os.environ.get('RAILWAY_ENVIRONMENT') or os.environ.get('RENDER') else 0
+    ))
+
+    # Occupancy feeds (/feeds/...) need ?token=FEED_TOKEN, a bearer token or an admin login;
+    # departed stays stay in the feeds for FEED_HISTORY_DAYS
+    FEED_TOKEN = os.environ.get('FEED_TOKEN')
+    FEED_HISTORY_DAYS = int(os.environ.get('FEED_HISTORY_DAYS', 7))
+
+    # Bearer token for /metrics; without it only logged-in admins can read metrics
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
     # Site Configuration
     SITE_NAME = os.environ.get('SITE_NAME', 'Bright Sky Campgrounds')
     ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'reservations@brightskycampgrounds.com')
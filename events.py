@@ -0,0 +1,60 @@
+"""Availability change notifications
+
+Views call notify_availability_changed() after committing a write that books,
+frees or blocks a site. Subscribers (such as the availability cache) connect to
+the availability_changed signal and receive the list of changes.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from blinker import Namespace
+from flask import current_app
+
+from models import db, Site
+
+# end_date is exclusive, like Reservation.departure_date
+AvailabilityChange = namedtuple(
+    'AvailabilityChange',
+    'campground_id site_id start_date end_date available reservation_id'
+)
+
+_signals = Namespace()
+availability_changed = _signals.signal('availability-changed')
+
+
+def _campground_ids(site_ids):
+    rows = db.session.query(Site.id, Site.campground_id).filter(Site.id.in_(set(site_ids))).all()
+    return dict(rows)
+
+
+def reservation_changes(rows, available):
+    """Build changes from reservations (or rows with id, site_id and dates)"""
+    campgrounds = _campground_ids(row.site_id for row in rows)
+    return [
+        AvailabilityChange(
+            campgrounds[row.site_id], row.site_id,
+            row.arrival_date, row.departure_date, available, row.id
+        )
+        for row in rows
+    ]
+
+
+def block_changes(start_date, end_date, campground_id=None, site_ids=None):
+    """Build changes for a blocked date range (end_date is the last blocked night)"""
+    if site_ids:
+        campgrounds = _campground_ids(site_ids)
+    else:
+        site_rows = db.session.query(Site.id).filter(Site.campground_id == campground_id).all()
+        campgrounds = {row.id: campground_id for row in site_rows}
+
+    return [
+        AvailabilityChange(
+            campgrounds[site_id], site_id, start_date, end_date + timedelta(days=1), False, None
+        )
+        for site_id in campgrounds
+    ]
+
+
+def notify_availability_changed(changes):
+    """Tell subscribers about committed changes"""
+    if changes:
+        availability_changed.send(current_app._get_current_object(), changes=changes)
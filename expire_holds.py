@@ -0,0 +1,14 @@
+"""Release pending reservations whose Stripe Checkout window has passed"""
+from factory import app_context
+from holds import release_expired_holds
+
+
+def expire_holds():
+    """Cancel stale pending holds and waitlist offers and notify subscribers"""
+    with app_context():
+        expired = release_expired_holds()
+        print(f"Expired {len(expired)} pending reservation(s)")
+
+
+if __name__ == '__main__':
+    expire_holds()
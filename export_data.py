@@ -3,13 +3,16 @@ import csv
 import json
 import argparse
 from datetime import datetime
-from app import app, db
-from models import Reservation, Site, Campground
+from archive import fetch_reservations
+from factory import app_context
 
 def export_to_csv(filename='reservations_export.csv'):
-    """Export all reservations to CSV format"""
-    with app.app_context():
-        reservations = Reservation.query.order_by(Reservation.created_at).all()
+    """Export all reservations, including archived ones, to CSV format"""
+    with app_context():
+        reservations = fetch_reservations(
+            lambda model: model.query.order_by(model.created_at),
+            key=lambda reservation: reservation.created_at
+        )
 
         with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
             fieldnames = [
@@ -52,9 +55,12 @@ def export_to_csv(filename='reservations_export.csv'):
 
 
 def export_to_json(filename='reservations_export.json'):
-    """Export all reservations to JSON format"""
-    with app.app_context():
-        reservations = Reservation.query.order_by(Reservation.created_at).all()
+    """Export all reservations, including archived ones, to JSON format"""
+    with app_context():
+        reservations = fetch_reservations(
+            lambda model: model.query.order_by(model.created_at),
+            key=lambda reservation: reservation.created_at
+        )
 
         data = {
             'export_date': datetime.now().isoformat(),
@@ -0,0 +1,85 @@
+"""Application factories
+
+create_app() builds the full web application with its blueprints.
+create_db_app() only sets up configuration, the database and the availability
+change subscribers, for CLI commands and cron jobs; it registers no views and
+never imports Stripe.
+"""
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from flask import Flask, has_app_context
+from werkzeug.middleware.proxy_fix import ProxyFix
+
+from config import Config
+from models import db
+
+
+def create_db_app(config_object=Config):
+    """Create an app with just the database layer and change subscribers"""
+    import availability_cache
+    import availability_stream
+    import manifest
+    import waitlist
+    from cli import campspots
+
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+
+    # Initialize extensions
+    db.init_app(app)
+    availability_cache.init_app(app)
+    availability_stream.init_app(app)
+    waitlist.init_app(app)
+    manifest.init_app(app)
+
+    app.cli.add_command(campspots)
+    return app
+
+
+def app_context():
+    """Reuse the active app context (e.g. under `flask campspots`) or push a db-only app"""
+    if has_app_context():
+        return nullcontext()
+    return create_db_app().app_context()
+
+
+def create_app(config_object=Config):
+    """Create the full web application"""
+    from views import admin, api, feeds, public
+
+    import holds
+    import rate_limit
+
+    app = create_db_app(config_object)
+    rate_limit.init_app(app)
+    holds.init_app(app)
+
+    proxies = app.config['TRUSTED_PROXY_COUNT']
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
+    app.register_blueprint(public.bp)
+    app.register_blueprint(api.bp)
+    app.register_blueprint(admin.bp)
+    app.register_blueprint(feeds.bp)
+
+    app.add_template_filter(currency_filter, 'currency')
+    app.context_processor(inject_globals)
+    return app
+
+
+def currency_filter(value):
+    """Format value as currency"""
+    return f"${value:,.2f}"
+
+
+def inject_globals():
+    """Inject global variables into templates"""
+    from flask import current_app
+
+    return {
+        'site_name': current_app.config['SITE_NAME'],
+        'stripe_publishable_key': current_app.config['STRIPE_PUBLISHABLE_KEY'],
+        'now': datetime.now,
+        'timedelta': timedelta
+    }
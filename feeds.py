@@ -0,0 +1,283 @@
+"""Occupancy feeds (iCalendar and JSON) per campground and per site
+
+A feed lists confirmed stays that have not yet departed (plus FEED_HISTORY_DAYS
+of recent ones) and the BlockedDate ranges that apply. Reservation.updated_at is
+the change log: a feed's version combines the availability cache's per-site
+write counters (bumped after every commit, so a transaction that commits after
+a later-stamped one still changes it) with the newest updated_at, move off its
+sites and block id. Polling clients get a 304 for one counter read and one
+indexed query, and a rendered feed is reused until the next write changes its
+version. `since=` returns only the stays and blocks changed at or after that
+time, with every status, plus the stays moved off the feed's sites, so clients
+keyed by reservation id can drop stays that were cancelled or moved away. The
+returned cursor trails the newest change by CURSOR_OVERLAP, so a write stamped
+earlier but committed later is still in the next delta.
+"""
+import hashlib
+import json
+import threading
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, func, or_, select
+
+import availability_cache
+from models import db, BlockedDate, Reservation, ReservationMove, Site
+
+# Rendered full feeds by (scope, id, format): (version, body)
+_rendered = {}
+_rendered_lock = threading.Lock()
+
+ICS_LINE_LIMIT = 75
+
+# Cursors are moved back this far; updated_at is stamped before commit, so a
+# slow transaction can land behind a newer timestamp (clients dedupe by id)
+CURSOR_OVERLAP = timedelta(minutes=2)
+
+
+class Feed:
+    """The reservations and blocks covered by one campground or site feed"""
+
+    def __init__(self, campground, site=None):
+        self.campground = campground
+        self.site = site
+        self.scope = ('site', site.id) if site else ('campground', campground.id)
+
+    def site_filter(self, column):
+        if self.site:
+            return column == self.site.id
+        return column.in_(select(Site.id).where(Site.campground_id == self.campground.id))
+
+    def site_ids(self):
+        if self.site:
+            return [self.site.id]
+        return db.session.scalars(select(Site.id).where(Site.campground_id == self.campground.id)).all()
+
+    def reservation_filter(self):
+        return self.site_filter(Reservation.site_id)
+
+    def block_filter(self):
+        site_blocks = (
+            BlockedDate.site_id == self.site.id if self.site
+            else BlockedDate.site_id.in_(select(Site.id).where(Site.campground_id == self.campground.id))
+        )
+        return or_(
+            site_blocks,
+            and_(BlockedDate.site_id.is_(None), BlockedDate.campground_id == self.campground.id),
+            and_(BlockedDate.site_id.is_(None), BlockedDate.campground_id.is_(None))
+        )
+
+    def window_start(self):
+        return date.today() - timedelta(days=current_app.config['FEED_HISTORY_DAYS'])
+
+    def version(self, since=None):
+        """Return (ETag, cursor) from the site write counters and the newest change"""
+        # Read the counters first: a write that lands after this read bumps them again
+        write_count = sum(availability_cache.site_versions(self.site_ids()).values())
+        changed_at, moved_at, block_id = db.session.execute(
+            select(
+                select(func.max(Reservation.updated_at)).where(self.reservation_filter()).scalar_subquery(),
+                select(func.max(ReservationMove.moved_at)).where(
+                    self.site_filter(ReservationMove.from_site_id)
+                ).scalar_subquery(),
+                select(func.max(BlockedDate.id)).where(self.block_filter()).scalar_subquery()
+            )
+        ).one()
+        marker = f'{self.scope}:{write_count}:{changed_at}:{moved_at}:{block_id}:{self.window_start()}:{since}'
+        newest = max(filter(None, (changed_at, moved_at)), default=None)
+        cursor = newest - CURSOR_OVERLAP if newest else None
+        return hashlib.sha1(marker.encode()).hexdigest()[:20], cursor
+
+    def stays(self, since=None):
+        query = Reservation.query.filter(self.reservation_filter()).join(Site)
+        if since:
+            # Every change, so clients can drop stays that are no longer confirmed
+            query = query.filter(Reservation.updated_at >= since)
+        else:
+            query = query.filter(
+                Reservation.status == 'confirmed',
+                Reservation.departure_date >= self.window_start()
+            )
+        return query.add_columns(Site.site_number).order_by(Reservation.arrival_date, Reservation.id).all()
+
+    def moved_out(self, since):
+        """Stays moved off the feed's sites at or after since and not moved back"""
+        return db.session.query(Reservation, ReservationMove).join(
+            ReservationMove, ReservationMove.reservation_id == Reservation.id
+        ).filter(
+            self.site_filter(ReservationMove.from_site_id),
+            ReservationMove.moved_at >= since,
+            ~self.reservation_filter()
+        ).order_by(ReservationMove.moved_at, ReservationMove.id).all()
+
+    def blocks(self, since=None):
+        query = BlockedDate.query.filter(self.block_filter())
+        if since:
+            query = query.filter(BlockedDate.created_at >= since)
+        else:
+            query = query.filter(BlockedDate.end_date >= self.window_start())
+        return query.order_by(BlockedDate.start_date, BlockedDate.id).all()
+
+
+def _stay_dict(reservation, site_number):
+    return {
+        'id': reservation.id,
+        'confirmation_code': reservation.confirmation_code,
+        'site_id': reservation.site_id,
+        'site_number': site_number,
+        'arrival_date': reservation.arrival_date.isoformat(),
+        'departure_date': reservation.departure_date.isoformat(),
+        'status': reservation.status,
+        'customer_name': reservation.customer_name,
+        'num_occupants': reservation.num_occupants,
+        'num_vehicles': reservation.num_vehicles,
+        'vehicle_info': reservation.vehicle_info,
+        'special_requests': reservation.special_requests,
+        'updated_at': reservation.updated_at.isoformat() if reservation.updated_at else None
+    }
+
+
+def _block_dict(block):
+    return {
+        'id': block.id,
+        'site_id': block.site_id,
+        'campground_id': block.campground_id,
+        'start_date': block.start_date.isoformat(),
+        'end_date': block.end_date.isoformat(),  # last blocked night
+        'reason': block.reason
+    }
+
+
+def _moved_dict(reservation, move):
+    return {
+        'id': reservation.id,
+        'confirmation_code': reservation.confirmation_code,
+        'site_id': move.from_site_id,
+        'moved_to_site_id': move.to_site_id,
+        'moved_at': move.moved_at.isoformat()
+    }
+
+
+def render_json(feed, stays, blocks, moved, cursor, since=None):
+    return json.dumps({
+        'campground_id': feed.campground.id,
+        'site_id': feed.site.id if feed.site else None,
+        'since': since.isoformat() if since else None,
+        # Pass back as since= to get only later changes
+        'cursor': cursor.isoformat() if cursor else None,
+        'stays': [_stay_dict(reservation, site_number) for reservation, site_number in stays],
+        # since= deltas only: stays that left the feed's sites; drop them by id
+        'moved_out': [_moved_dict(reservation, move) for reservation, move in moved],
+        'blocked_dates': [_block_dict(block) for block in blocks]
+    })
+
+
+def _ics_escape(value):
+    return (str(value or '').replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _ics_fold(line):
+    """Fold a content line at 75 octets as RFC 5545 requires"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= ICS_LINE_LIMIT:
+        return line
+
+    parts = []
+    limit = ICS_LINE_LIMIT
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte character
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+        limit = ICS_LINE_LIMIT - 1  # continuation lines start with a space
+    return '\r\n '.join(parts)
+
+
+def _ics_timestamp(value):
+    return (value or datetime.utcnow()).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_ics(feed, stays, blocks, moved, cursor, since=None):
+    name = feed.campground.name if not feed.site else f'{feed.campground.name} site {feed.site.site_number}'
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:-//{current_app.config["SITE_NAME"]}//Occupancy feed//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_ics_escape(name)}',
+    ]
+
+    for reservation, site_number in stays:
+        details = [f'{reservation.num_occupants} guests, {reservation.num_vehicles} vehicles']
+        if reservation.vehicle_info:
+            details.append(f'Vehicle: {reservation.vehicle_info}')
+        if reservation.special_requests:
+            details.append(f'Requests: {reservation.special_requests}')
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:reservation-{reservation.id}@campspots',
+            f'DTSTAMP:{_ics_timestamp(reservation.updated_at)}',
+            f'LAST-MODIFIED:{_ics_timestamp(reservation.updated_at)}',
+            f'DTSTART;VALUE=DATE:{reservation.arrival_date.strftime("%Y%m%d")}',
+            f'DTEND;VALUE=DATE:{reservation.departure_date.strftime("%Y%m%d")}',
+            f'SUMMARY:{_ics_escape(f"Site {site_number}: {reservation.customer_name} ({reservation.confirmation_code})")}',
+            f'DESCRIPTION:{_ics_escape(chr(10).join(details))}',
+            'STATUS:CONFIRMED' if reservation.status == 'confirmed' else 'STATUS:CANCELLED',
+            'TRANSP:OPAQUE',
+            'END:VEVENT',
+        ]
+
+    for reservation, move in moved:
+        # Same UID as the stay's event, so calendars drop it from this feed
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:reservation-{reservation.id}@campspots',
+            f'DTSTAMP:{_ics_timestamp(move.moved_at)}',
+            f'LAST-MODIFIED:{_ics_timestamp(move.moved_at)}',
+            f'DTSTART;VALUE=DATE:{reservation.arrival_date.strftime("%Y%m%d")}',
+            f'DTEND;VALUE=DATE:{reservation.departure_date.strftime("%Y%m%d")}',
+            f'SUMMARY:{_ics_escape(f"Moved: {reservation.customer_name} ({reservation.confirmation_code})")}',
+            'STATUS:CANCELLED',
+            'END:VEVENT',
+        ]
+
+    for block in blocks:
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:blocked-date-{block.id}@campspots',
+            f'DTSTAMP:{_ics_timestamp(block.created_at)}',
+            f'DTSTART;VALUE=DATE:{block.start_date.strftime("%Y%m%d")}',
+            # DTEND is exclusive; end_date is the last blocked night
+            f'DTEND;VALUE=DATE:{(block.end_date + timedelta(days=1)).strftime("%Y%m%d")}',
+            f'SUMMARY:{_ics_escape("Closed: " + (block.reason or "blocked"))}',
+            'TRANSP:OPAQUE',
+            'END:VEVENT',
+        ]
+
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(_ics_fold(line) for line in lines) + '\r\n'
+
+
+RENDERERS = {'ics': render_ics, 'json': render_json}
+
+
+def render_feed(feed, fmt, version, cursor, since=None):
+    """Render a feed, reusing the rendered full feed until its version changes"""
+    key = (feed.scope, fmt)
+
+    if since is None:
+        with _rendered_lock:
+            cached = _rendered.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+
+    moved = feed.moved_out(since) if since else []
+    body = RENDERERS[fmt](feed, feed.stays(since), feed.blocks(since), moved, cursor, since)
+
+    if since is None:
+        with _rendered_lock:
+            _rendered[key] = (version, body)
+    return body
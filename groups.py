@@ -0,0 +1,34 @@
+"""Search for groups of adjacent sites that are free for the same dates"""
+from sqlalchemy.orm import selectinload
+
+import availability_cache
+from models import SiteGroup
+
+
+def available_groups(campground_id, arrival_date, departure_date, num_occupants=0, num_vehicles=0):
+    """Active site groups in a campground whose sites are all free and fit the party.
+
+    Every member site's booked intervals come from one availability cache
+    lookup (misses are loaded with a single query), so the search costs the
+    same however many groups a campground has.
+    """
+    groups = SiteGroup.query.filter_by(campground_id=campground_id, active=True).options(
+        selectinload(SiteGroup.sites)
+    ).order_by(SiteGroup.id).all()
+
+    site_ids = {site.id for group in groups for site in group.sites}
+    if not site_ids:
+        return []
+    intervals = availability_cache.get_intervals(site_ids)
+
+    return [
+        group for group in groups
+        if group.sites
+        and all(site.active for site in group.sites)
+        and group.max_occupancy >= num_occupants
+        and group.max_vehicles >= num_vehicles
+        and all(
+            availability_cache.is_free(intervals[site.id], arrival_date, departure_date)
+            for site in group.sites
+        )
+    ]
@@ -0,0 +1,51 @@
+"""Release of expired checkout holds and waitlist offers
+
+The web app releases them itself at most every HOLD_SWEEP_SECONDS per worker,
+at the start of whichever request comes next, so holds expire even where no
+cron job runs `flask campspots sweep`.
+"""
+import threading
+import time
+
+from flask import current_app
+
+import waitlist
+from events import notify_availability_changed, reservation_changes
+from models import db
+from operations import expire_pending_reservations
+
+EXTENSION_KEY = 'holds'
+
+
+def release_expired_holds(site_ids=None):
+    """Cancel expired checkout holds and waitlist offers, then notify subscribers"""
+    expired = expire_pending_reservations(current_app.config['PENDING_HOLD_MINUTES'], site_ids=site_ids)
+    expired += waitlist.expire_offers(site_ids=site_ids)
+    if expired:
+        db.session.commit()
+        notify_availability_changed(reservation_changes(expired, available=True))
+    return expired
+
+
+def release_expired_holds_if_due():
+    """Run release_expired_holds once the sweep interval has passed in this worker"""
+    state = current_app.extensions[EXTENSION_KEY]
+    if time.monotonic() < state['next_sweep'] or not state['lock'].acquire(blocking=False):
+        return
+    try:
+        state['next_sweep'] = time.monotonic() + current_app.config['HOLD_SWEEP_SECONDS']
+        release_expired_holds()
+    except Exception:
+        # Never fail the request that happened to trigger the sweep
+        db.session.rollback()
+        current_app.logger.exception('Releasing expired holds failed')
+    finally:
+        state['lock'].release()
+
+
+def init_app(app):
+    """Sweep expired holds from web requests (HOLD_SWEEP_SECONDS=0 turns it off)"""
+    app.config.setdefault('HOLD_SWEEP_SECONDS', 60)
+    app.extensions[EXTENSION_KEY] = {'lock': threading.Lock(), 'next_sweep': 0}
+    if app.config['HOLD_SWEEP_SECONDS']:
+        app.before_request(release_expired_holds_if_due)
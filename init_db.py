@@ -1,16 +1,62 @@
 """Initialize the database with campgrounds and sites"""
-from app import app, db
-from models import Campground, Site
+from sqlalchemy.schema import CreateIndex
+
+from factory import app_context
+from models import db, Campground, Site, SiteGroup
+from search import ensure_search_indexes
+
+
+def ensure_indexes():
+    """Create indexes added to models after their tables already existed"""
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+    ensure_search_indexes()
+
+
+# Paired multi-family sites that are booked together by large groups
+SITE_GROUPS = {
+    'North Fork': [('18', '19'), ('24', '25'), ('47', '48')],
+    'Cave Creek': [('21', '22'), ('25', '26')],
+}
+
+
+def ensure_site_groups():
+    """Create the adjacent multi-family site groups if they don't exist yet"""
+    for campground_name, pairs in SITE_GROUPS.items():
+        campground = Campground.query.filter_by(name=campground_name).first()
+        if campground is None:
+            continue
+
+        for site_numbers in pairs:
+            name = f"Multi-family sites {' & '.join(site_numbers)}"
+            if SiteGroup.query.filter_by(campground_id=campground.id, name=name).first():
+                continue
+
+            sites = Site.query.filter(
+                Site.campground_id == campground.id, Site.site_number.in_(site_numbers)
+            ).order_by(Site.id).all()
+            db.session.add(SiteGroup(
+                campground_id=campground.id,
+                name=name,
+                description='Adjacent multi-family sites',
+                sites=sites
+            ))
+    db.session.commit()
+
 
 def init_database():
     """Create tables and populate with initial data"""
-    with app.app_context():
+    with app_context():
         # Create all tables
         db.create_all()
+        ensure_indexes()
 
         # Check if data already exists
         try:
             if Campground.query.first():
+                ensure_site_groups()
                 print("Database already initialized. Skipping.")
                 return
         except Exception as e:
@@ -269,6 +315,7 @@ def init_database():
         print(f"Created campground: {pikes_ridge.name} with 60 sites")
 
         db.session.commit()
+        ensure_site_groups()
         print("\n" + "="*60)
         print("Database initialization complete!")
         print("="*60)
@@ -0,0 +1,147 @@
+"""Daily arrivals, departures and in-house guests for gate operations
+
+manifest_entries holds one row per confirmed guest per day: an `arrival` row on
+the arrival date, `in_house` rows for the days in between and a `departure` row
+on the departure date. The table is refreshed incrementally from the
+Reservation.updated_at change log: only reservations changed since the last
+refresh have their rows replaced, so the manifest page is a single indexed read.
+That refresh runs before the page renders. After a booking change only the
+reservations in the change are rewritten, without touching the shared
+watermark, so write paths in different workers never wait on each other.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import delete, insert
+
+from events import availability_changed
+from models import db, ManifestEntry, ManifestState, Reservation, Site
+
+MANIFEST_KINDS = ('arrival', 'in_house', 'departure')
+
+# Manifest days older than this are pruned on refresh
+MANIFEST_HISTORY_DAYS = 30
+
+# Changes are re-read this far behind the watermark, so a transaction that
+# committed after a later one is still picked up; replacing rows is idempotent
+REFRESH_OVERLAP = timedelta(minutes=2)
+
+# Reservations whose rows are replaced per statement
+REFRESH_BATCH_SIZE = 500
+
+GUEST_FIELDS = (
+    'customer_name', 'customer_phone', 'arrival_date', 'departure_date',
+    'num_occupants', 'num_vehicles', 'vehicle_info', 'special_requests', 'payment_status'
+)
+
+
+def manifest_rows(reservation, site_number, campground_id, oldest_day):
+    """Build the manifest rows for one confirmed stay, skipping days before oldest_day"""
+    guest = {field: getattr(reservation, field) for field in GUEST_FIELDS}
+    guest.update(
+        campground_id=campground_id,
+        site_id=reservation.site_id,
+        site_number=site_number,
+        reservation_id=reservation.id
+    )
+
+    rows = []
+    day = max(reservation.arrival_date, oldest_day)
+    while day <= reservation.departure_date:
+        if day == reservation.arrival_date:
+            kind = 'arrival'
+        elif day == reservation.departure_date:
+            kind = 'departure'
+        else:
+            kind = 'in_house'
+        rows.append(dict(guest, day=day, kind=kind))
+        day += timedelta(days=1)
+    return rows
+
+
+def _changed_reservations(oldest_day):
+    return db.session.query(Reservation, Site.site_number, Site.campground_id).join(Site).filter(
+        Reservation.departure_date >= oldest_day
+    )
+
+
+def _replace_rows(changed, oldest_day):
+    """Rewrite the manifest rows of (reservation, site_number, campground_id) rows"""
+    for start in range(0, len(changed), REFRESH_BATCH_SIZE):
+        batch = changed[start:start + REFRESH_BATCH_SIZE]
+        db.session.execute(
+            delete(ManifestEntry).where(ManifestEntry.reservation_id.in_([row[0].id for row in batch])),
+            execution_options={'synchronize_session': False}
+        )
+        rows = []
+        for reservation, site_number, campground_id in batch:
+            if reservation.status == 'confirmed':
+                rows += manifest_rows(reservation, site_number, campground_id, oldest_day)
+        if rows:
+            db.session.execute(insert(ManifestEntry), rows)
+
+
+def refresh_manifest():
+    """Replace the rows of reservations changed since the last refresh; returns how many"""
+    state = db.session.get(ManifestState, 1, with_for_update=True)
+    if state is None:
+        state = ManifestState(id=1)
+        db.session.add(state)
+
+    oldest_day = date.today() - timedelta(days=MANIFEST_HISTORY_DAYS)
+    query = _changed_reservations(oldest_day)
+    if state.refreshed_through:
+        query = query.filter(Reservation.updated_at >= state.refreshed_through - REFRESH_OVERLAP)
+    changed = query.order_by(Reservation.id).all()
+    _replace_rows(changed, oldest_day)
+
+    db.session.execute(
+        delete(ManifestEntry).where(ManifestEntry.day < oldest_day),
+        execution_options={'synchronize_session': False}
+    )
+
+    newest = max((row[0].updated_at for row in changed if row[0].updated_at), default=None)
+    if newest and (state.refreshed_through is None or newest > state.refreshed_through):
+        state.refreshed_through = newest
+    db.session.commit()
+    return len(changed)
+
+
+def refresh_reservations(reservation_ids):
+    """Replace the rows of just these reservations; the watermark is left alone"""
+    oldest_day = date.today() - timedelta(days=MANIFEST_HISTORY_DAYS)
+    # Row locks on the reservations only, so two refreshes of one stay can't both insert
+    changed = _changed_reservations(oldest_day).filter(
+        Reservation.id.in_(reservation_ids)
+    ).order_by(Reservation.id).with_for_update(of=Reservation).all()
+    _replace_rows(changed, oldest_day)
+    db.session.commit()
+    return len(changed)
+
+
+def daily_manifest(campground_id, day):
+    """Manifest rows for a campground and day, grouped by kind"""
+    entries = ManifestEntry.query.filter_by(campground_id=campground_id, day=day).order_by(
+        ManifestEntry.site_id, ManifestEntry.reservation_id
+    ).all()
+
+    manifest = {kind: [] for kind in MANIFEST_KINDS}
+    for entry in entries:
+        manifest[entry.kind].append(entry)
+    return manifest
+
+
+def _on_availability_changed(app, changes):
+    reservation_ids = {change.reservation_id for change in changes if change.reservation_id}
+    if not reservation_ids:
+        return
+
+    try:
+        refresh_reservations(reservation_ids)
+    except Exception:
+        # The write that triggered this is already committed; the page refreshes again
+        db.session.rollback()
+        app.logger.exception('Manifest refresh failed')
+
+
+def init_app(app):
+    availability_changed.connect(_on_availability_changed, app)
@@ -0,0 +1,69 @@
+"""In-process counters exported in Prometheus text format
+
+Values are kept per process, so with several gunicorn workers each scrape sees
+the worker that answered it; the pid label tells them apart.
+"""
+import os
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_values = defaultdict(float)
+_descriptions = {}
+
+
+def describe(name, help_text, kind='counter'):
+    """Register a metric's HELP text and TYPE (counter, gauge or summary)"""
+    _descriptions[name] = (help_text, kind)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    """Increment a counter"""
+    with _lock:
+        _values[_key(name, labels)] += amount
+
+
+def set_gauge(name, value, **labels):
+    with _lock:
+        _values[_key(name, labels)] = value
+
+
+def observe(name, value, **labels):
+    """Record one observation of a summary (exported as _sum and _count)"""
+    with _lock:
+        _values[_key(f'{name}_sum', labels)] += value
+        _values[_key(f'{name}_count', labels)] += 1
+
+
+def _base_name(name):
+    """Map a summary's _sum/_count series back to the described metric name"""
+    for suffix in ('_sum', '_count'):
+        if name.endswith(suffix) and name[:-len(suffix)] in _descriptions:
+            return name[:-len(suffix)]
+    return name
+
+
+def render():
+    """Render all metrics in Prometheus text exposition format"""
+    pid = str(os.getpid())
+    with _lock:
+        values = sorted(_values.items(), key=lambda item: (_base_name(item[0][0]), item[0]))
+
+    lines = []
+    described = set()
+    for (name, labels), value in values:
+        base = _base_name(name)
+        if base in _descriptions and base not in described:
+            help_text, kind = _descriptions[base]
+            lines.append(f'# HELP {base} {help_text}')
+            lines.append(f'# TYPE {base} {kind}')
+            described.add(base)
+
+        label_text = ','.join(f'{key}="{val}"' for key, val in labels + (('pid', pid),))
+        lines.append(f'{name}{{{label_text}}} {value:g}')
+
+    return '\n'.join(lines) + '\n'
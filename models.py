@@ -1,7 +1,12 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from replica import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Reservation statuses that hold a site
+ACTIVE_STATUSES = ('pending', 'confirmed')
 
 
 class Campground(db.Model):
@@ -46,16 +51,22 @@ class Site(db.Model):
         """Check if site is available for given date range"""
         overlapping = Reservation.query.filter(
             Reservation.site_id == self.id,
-            Reservation.status.in_(['pending', 'confirmed']),
+            Reservation.status.in_(ACTIVE_STATUSES),
             Reservation.arrival_date < departure_date,
             Reservation.departure_date > arrival_date
         ).first()
-        return overlapping is None
+        if overlapping is not None:
+            return False
 
+        blocked = BlockedDate.query.filter(
+            BlockedDate.applies_to(self),
+            BlockedDate.overlaps(arrival_date, departure_date)
+        ).first()
+        return blocked is None
 
-class Reservation(db.Model):
-    """Represents a campsite reservation"""
-    __tablename__ = 'reservations'
+
+class ReservationRecord:
+    """Columns shared by live and archived reservations"""
 
     id = db.Column(db.Integer, primary_key=True)
     site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False)
@@ -78,7 +89,7 @@ class Reservation(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     stripe_payment_id = db.Column(db.String(200))
     stripe_session_id = db.Column(db.String(200))
-    payment_status = db.Column(db.String(50), default='pending')  # pending, paid, refunded, failed
+    payment_status = db.Column(db.String(50), default='pending')  # pending, paid, refund_due, refunded, failed
 
     # Status
     status = db.Column(db.String(50), default='pending')  # pending, confirmed, cancelled, completed
@@ -86,18 +97,70 @@ class Reservation(db.Model):
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
-    created_by = db.Column(db.String(100), default='customer')  # customer, admin, phone
+    created_by = db.Column(db.String(100), default='customer')  # customer, admin, phone, waitlist
     notes = db.Column(db.Text)
 
-    def __repr__(self):
-        return f'<Reservation {self.id} - {self.customer_name}>'
-
     @property
     def confirmation_code(self):
         """Generate a simple confirmation code"""
         return f"BS{self.id:06d}"
 
 
+class Reservation(ReservationRecord, db.Model):
+    """Represents a campsite reservation"""
+    __tablename__ = 'reservations'
+
+    def __repr__(self):
+        return f'<Reservation {self.id} - {self.customer_name}>'
+
+
+# Exact, case-insensitive email lookups from the admin search box
+db.Index('ix_reservations_customer_email_lower', db.func.lower(Reservation.customer_email))
+# Newest change per site, for occupancy feed ETags and since= deltas
+db.Index('ix_reservations_site_updated_at', Reservation.site_id, Reservation.updated_at)
+
+
+class ReservationMove(db.Model):
+    """A reservation moved off a site, so that site's feeds can report it leaving"""
+    __tablename__ = 'reservation_moves'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: moves outlive reservations moved to the archive
+    reservation_id = db.Column(db.Integer, nullable=False)
+    from_site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False)
+    to_site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False)
+    moved_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Newest move off each site, for occupancy feed ETags and since= deltas
+    __table_args__ = (
+        db.Index('ix_reservation_moves_from_site', 'from_site_id', 'moved_at'),
+    )
+
+    def __repr__(self):
+        return f'<ReservationMove {self.reservation_id} {self.from_site_id} -> {self.to_site_id}>'
+
+
+class ArchivedReservation(ReservationRecord, db.Model):
+    """A long-departed reservation moved out of the live table by archive.py"""
+    __tablename__ = 'reservations_archive'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # keeps the original id
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    site = db.relationship('Site')
+
+    __table_args__ = (
+        db.Index('ix_reservations_archive_site_arrival', 'site_id', 'arrival_date'),
+    )
+
+    def __repr__(self):
+        return f'<ArchivedReservation {self.id} - {self.customer_name}>'
+
+
+# The same email lookup for searches that reach the archive
+db.Index('ix_reservations_archive_customer_email_lower', db.func.lower(ArchivedReservation.customer_email))
+
+
 class BlockedDate(db.Model):
     """Represents dates when sites are blocked for maintenance or special events"""
     __tablename__ = 'blocked_dates'
@@ -112,3 +175,141 @@ class BlockedDate(db.Model):
 
     def __repr__(self):
         return f'<BlockedDate {self.start_date} to {self.end_date}>'
+
+    @classmethod
+    def applies_to(cls, site):
+        """Filter for blocks covering a site: its own, its campground's, or global"""
+        return db.or_(
+            cls.site_id == site.id,
+            db.and_(cls.site_id.is_(None), cls.campground_id == site.campground_id),
+            db.and_(cls.site_id.is_(None), cls.campground_id.is_(None))
+        )
+
+    @classmethod
+    def overlaps(cls, arrival_date, departure_date):
+        """Filter for blocks overlapping a stay (end_date is the last blocked night)"""
+        return db.and_(cls.start_date < departure_date, cls.end_date >= arrival_date)
+
+
+class WaitlistEntry(db.Model):
+    """A guest waiting for a site to free up for their dates"""
+    __tablename__ = 'waitlist_entries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), nullable=False, unique=True)  # guest's status link
+    campground_id = db.Column(db.Integer, db.ForeignKey('campgrounds.id'), nullable=False)
+    arrival_date = db.Column(db.Date, nullable=False)
+    departure_date = db.Column(db.Date, nullable=False)
+    features = db.Column(db.String(200))  # comma separated, e.g. "electric,handicap"
+
+    customer_name = db.Column(db.String(200), nullable=False)
+    customer_email = db.Column(db.String(200), nullable=False)
+    customer_phone = db.Column(db.String(50), nullable=False)
+    num_occupants = db.Column(db.Integer, nullable=False)
+    num_vehicles = db.Column(db.Integer, nullable=False)
+
+    status = db.Column(db.String(50), default='waiting')  # waiting, offered, booked, declined, expired
+    offered_reservation_id = db.Column(db.Integer, db.ForeignKey('reservations.id', ondelete='SET NULL'))
+    offer_expires_at = db.Column(db.DateTime)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    campground = db.relationship('Campground')
+    offered_reservation = db.relationship('Reservation')
+
+    # Matching looks up waiting entries by campground and an arrival range
+    __table_args__ = (
+        db.Index('ix_waitlist_entries_match', 'campground_id', 'status', 'arrival_date', 'departure_date'),
+    )
+
+    def __repr__(self):
+        return f'<WaitlistEntry {self.id} - {self.customer_name}>'
+
+    @property
+    def feature_list(self):
+        return [feature for feature in (self.features or '').split(',') if feature]
+
+
+class ManifestEntry(db.Model):
+    """One guest on one day's gate manifest, kept up to date by manifest.py"""
+    __tablename__ = 'manifest_entries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # arrival, in_house, departure
+    campground_id = db.Column(db.Integer, db.ForeignKey('campgrounds.id'), nullable=False)
+    site_id = db.Column(db.Integer, db.ForeignKey('sites.id'), nullable=False)
+    site_number = db.Column(db.String(20), nullable=False)
+    reservation_id = db.Column(db.Integer, nullable=False, index=True)
+
+    customer_name = db.Column(db.String(200), nullable=False)
+    customer_phone = db.Column(db.String(50), nullable=False)
+    arrival_date = db.Column(db.Date, nullable=False)
+    departure_date = db.Column(db.Date, nullable=False)
+    num_occupants = db.Column(db.Integer, nullable=False)
+    num_vehicles = db.Column(db.Integer, nullable=False)
+    vehicle_info = db.Column(db.Text)
+    special_requests = db.Column(db.Text)
+    payment_status = db.Column(db.String(50))
+
+    # The manifest page reads one campground's day at a time
+    __table_args__ = (
+        db.Index('ix_manifest_entries_day', 'campground_id', 'day', 'kind', 'site_id'),
+    )
+
+    def __repr__(self):
+        return f'<ManifestEntry {self.day} {self.kind} - {self.customer_name}>'
+
+    @property
+    def confirmation_code(self):
+        return f"BS{self.reservation_id:06d}"
+
+
+class ManifestState(db.Model):
+    """How far the manifest has caught up with Reservation.updated_at (one row)"""
+    __tablename__ = 'manifest_state'
+
+    id = db.Column(db.Integer, primary_key=True)
+    refreshed_through = db.Column(db.DateTime)
+
+
+# Sites that sit next to each other and can be booked together
+site_group_members = db.Table(
+    'site_group_members',
+    db.Column('group_id', db.Integer, db.ForeignKey('site_groups.id'), primary_key=True),
+    db.Column('site_id', db.Integer, db.ForeignKey('sites.id'), primary_key=True, index=True)
+)
+
+
+class SiteGroup(db.Model):
+    """A set of adjacent sites that a large party can reserve in one checkout"""
+    __tablename__ = 'site_groups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    campground_id = db.Column(db.Integer, db.ForeignKey('campgrounds.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    active = db.Column(db.Boolean, default=True)
+
+    campground = db.relationship('Campground')
+    sites = db.relationship('Site', secondary=site_group_members, order_by='Site.id', backref='groups')
+
+    def __repr__(self):
+        return f'<SiteGroup {self.name}>'
+
+    @property
+    def site_numbers(self):
+        return ', '.join(site.site_number for site in self.sites)
+
+    @property
+    def max_occupancy(self):
+        return sum(site.max_occupancy for site in self.sites)
+
+    @property
+    def max_vehicles(self):
+        return sum(site.max_vehicles for site in self.sites)
+
+    @property
+    def price_per_night(self):
+        return sum(site.price_per_night for site in self.sites)
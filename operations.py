@@ -0,0 +1,456 @@
+"""Set-based reservation operations for admin endpoints, group bookings and maintenance jobs
+
+Every function here works on many rows with a handful of statements and leaves
+the transaction open, so callers can combine several operations and commit (or
+roll back) once.
+"""
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, or_, update
+
+from models import db, ACTIVE_STATUSES, BlockedDate, Campground, Reservation, ReservationMove, Site
+
+# A requested site occupancy; reservation_id is None for new reservations
+Stay = namedtuple('Stay', 'site_id arrival_date departure_date reservation_id')
+# A reservation moved by move_reservations()
+Move = namedtuple('Move', 'id old_site_id site_id arrival_date departure_date')
+
+CUSTOMER_FIELDS = (
+    'customer_name', 'customer_email', 'customer_phone',
+    'num_occupants', 'num_vehicles'
+)
+OPTIONAL_FIELDS = ('vehicle_info', 'special_requests', 'notes')
+CREATED_BY_CHOICES = ('admin', 'phone')
+PAYMENT_STATUS_CHOICES = ('pending', 'paid')
+
+# Extra time past the Stripe Checkout expiry before a pending hold is released,
+# so a guest finishing payment at the last second never loses their site
+HOLD_GRACE_MINUTES = 5
+
+
+class ReservationConflict(Exception):
+    """Raised when a requested stay overlaps a reservation, a block or another stay"""
+
+    def __init__(self, conflicts):
+        super().__init__(f'{len(conflicts)} conflicting stay(s)')
+        self.conflicts = conflicts
+
+
+def lock_sites(site_ids):
+    """Load sites by id, taking row locks on PostgreSQL to serialize conflict checks"""
+    sites = Site.query.filter(Site.id.in_(site_ids)).order_by(Site.id).with_for_update().all()
+    missing = set(site_ids) - {site.id for site in sites}
+    if missing:
+        raise ValueError(f'Unknown site id(s): {sorted(missing)}')
+    return {site.id: site for site in sites}
+
+
+def find_conflicts(stays, sites):
+    """Check stays against existing reservations, blocks and each other.
+
+    Existing reservations and blocks for all involved sites are fetched with one
+    query each over the combined date window, then compared in memory.
+    """
+    if not stays:
+        return []
+
+    window_start = min(stay.arrival_date for stay in stays)
+    window_end = max(stay.departure_date for stay in stays)
+    moving_ids = {stay.reservation_id for stay in stays if stay.reservation_id}
+    campground_ids = {site.campground_id for site in sites.values()}
+
+    existing = db.session.query(
+        Reservation.id, Reservation.site_id, Reservation.arrival_date, Reservation.departure_date
+    ).filter(
+        Reservation.site_id.in_(sites.keys()),
+        Reservation.status.in_(ACTIVE_STATUSES),
+        Reservation.arrival_date < window_end,
+        Reservation.departure_date > window_start,
+        ~Reservation.id.in_(moving_ids)
+    ).all()
+
+    blocks = BlockedDate.query.filter(
+        or_(
+            BlockedDate.site_id.in_(sites.keys()),
+            BlockedDate.site_id.is_(None) & BlockedDate.campground_id.in_(campground_ids),
+            BlockedDate.site_id.is_(None) & BlockedDate.campground_id.is_(None)
+        ),
+        BlockedDate.overlaps(window_start, window_end)
+    ).all()
+
+    booked = defaultdict(list)
+    for row in existing:
+        booked[row.site_id].append(row)
+
+    conflicts = []
+    requested = defaultdict(list)
+    for stay in stays:
+        site = sites[stay.site_id]
+
+        for row in booked[stay.site_id]:
+            if row.arrival_date < stay.departure_date and row.departure_date > stay.arrival_date:
+                conflicts.append(_conflict(stay, 'reservation', row.id))
+
+        for block in blocks:
+            covers_site = (
+                block.site_id == site.id
+                or (block.site_id is None and block.campground_id in (None, site.campground_id))
+            )
+            if covers_site and block.start_date < stay.departure_date and block.end_date >= stay.arrival_date:
+                conflicts.append(_conflict(stay, 'blocked_date', block.id))
+
+        for other in requested[stay.site_id]:
+            if other.arrival_date < stay.departure_date and other.departure_date > stay.arrival_date:
+                conflicts.append(_conflict(stay, 'request', other.reservation_id))
+        requested[stay.site_id].append(stay)
+
+    return conflicts
+
+
+def _conflict(stay, kind, conflicting_id):
+    return {
+        'site_id': stay.site_id,
+        'arrival_date': stay.arrival_date.isoformat(),
+        'departure_date': stay.departure_date.isoformat(),
+        'reservation_id': stay.reservation_id,
+        'conflicts_with': kind,
+        'conflicting_id': conflicting_id
+    }
+
+
+def _count(value, field):
+    """Parse a count of at least 1, naming the field on error"""
+    try:
+        if isinstance(value, (bool, float)):
+            raise TypeError
+        count = int(value)
+    except (TypeError, ValueError):
+        count = 0
+    if count < 1:
+        raise ValueError(f'{field} must be a whole number of at least 1')
+    return count
+
+
+def _amount(value, field):
+    """Parse a non-negative amount in dollars, naming the field on error"""
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        amount = float(value)
+    except (TypeError, ValueError):
+        amount = -1
+    if not 0 <= amount < float('inf'):
+        raise ValueError(f'{field} must be a non-negative number')
+    return amount
+
+
+def create_reservations(items):
+    """Insert admin/phone reservations in one statement after a conflict check.
+
+    Each item holds site_id, arrival_date, departure_date (dates), the customer
+    fields and optionally created_by, payment_status, vehicle_info,
+    special_requests and notes. Returns (id, site_id, arrival_date,
+    departure_date) rows for the new reservations.
+    """
+    if not items:
+        return []
+
+    sites = lock_sites({item['site_id'] for item in items})
+    stays = []
+    rows = []
+    now = datetime.utcnow()
+
+    for item in items:
+        arrival_date = item['arrival_date']
+        departure_date = item['departure_date']
+        if arrival_date >= departure_date:
+            raise ValueError('Departure date must be after arrival date')
+
+        missing = [field for field in CUSTOMER_FIELDS if item.get(field) in (None, '')]
+        if missing:
+            raise ValueError(f'Missing field(s): {", ".join(missing)}')
+        item['num_occupants'] = _count(item['num_occupants'], 'num_occupants')
+        item['num_vehicles'] = _count(item['num_vehicles'], 'num_vehicles')
+
+        created_by = item.get('created_by', 'admin')
+        if created_by not in CREATED_BY_CHOICES:
+            raise ValueError(f'created_by must be one of {", ".join(CREATED_BY_CHOICES)}')
+
+        payment_status = item.get('payment_status', 'pending')
+        if payment_status not in PAYMENT_STATUS_CHOICES:
+            raise ValueError(f'payment_status must be one of {", ".join(PAYMENT_STATUS_CHOICES)}')
+
+        site = sites[item['site_id']]
+        num_nights = (departure_date - arrival_date).days
+        stays.append(Stay(site.id, arrival_date, departure_date, None))
+
+        row = {field: item[field] for field in CUSTOMER_FIELDS}
+        row.update({field: item.get(field) for field in OPTIONAL_FIELDS})
+        row.update(
+            site_id=site.id,
+            arrival_date=arrival_date,
+            departure_date=departure_date,
+            num_nights=num_nights,
+            total_amount=(
+                _amount(item['total_amount'], 'total_amount') if item.get('total_amount') is not None
+                else site.price_per_night * num_nights
+            ),
+            status='confirmed',
+            payment_status=payment_status,
+            created_by=created_by,
+            created_at=now,
+            updated_at=now
+        )
+        rows.append(row)
+
+    conflicts = find_conflicts(stays, sites)
+    if conflicts:
+        raise ReservationConflict(conflicts)
+
+    # Rows come back in the order of items, so callers can match ids by position
+    result = db.session.execute(
+        insert(Reservation).returning(
+            Reservation.id, Reservation.site_id, Reservation.arrival_date, Reservation.departure_date,
+            sort_by_parameter_order=True
+        ),
+        rows
+    )
+    return result.all()
+
+
+def _split(total, capacities):
+    """Spread total over slots as evenly as their capacities allow, or return None"""
+    shares = [0] * len(capacities)
+    for _ in range(total):
+        open_slots = [i for i, capacity in enumerate(capacities) if shares[i] < capacity]
+        if not open_slots:
+            return None
+        shares[min(open_slots, key=lambda i: shares[i])] += 1
+    return shares
+
+
+def hold_sites(site_ids, arrival_date, departure_date, guest):
+    """Create pending reservations for several sites at once, or none at all.
+
+    The sites are locked and checked together, so two groups racing for the
+    same sites cannot both get a partial booking. guest holds the customer
+    fields for the whole party; occupants and vehicles are spread across the
+    sites within each site's limits. Returns the new Reservation objects
+    (flushed, not committed).
+    """
+    if arrival_date >= departure_date:
+        raise ValueError('Departure date must be after arrival date')
+
+    missing = [field for field in CUSTOMER_FIELDS if guest.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f'Missing field(s): {", ".join(missing)}')
+
+    sites = lock_sites(set(site_ids))
+    ordered = [sites[site_id] for site_id in sorted(sites)]
+
+    occupants = _split(guest['num_occupants'], [site.max_occupancy for site in ordered])
+    vehicles = _split(guest['num_vehicles'], [site.max_vehicles for site in ordered])
+    if occupants is None or vehicles is None:
+        raise ValueError('The party is too large for these sites')
+
+    conflicts = find_conflicts(
+        [Stay(site.id, arrival_date, departure_date, None) for site in ordered], sites
+    )
+    if conflicts:
+        raise ReservationConflict(conflicts)
+
+    num_nights = (departure_date - arrival_date).days
+    reservations = [
+        Reservation(
+            site_id=site.id,
+            customer_name=guest['customer_name'],
+            customer_email=guest['customer_email'],
+            customer_phone=guest['customer_phone'],
+            arrival_date=arrival_date,
+            departure_date=departure_date,
+            num_nights=num_nights,
+            num_occupants=site_occupants,
+            num_vehicles=site_vehicles,
+            vehicle_info=guest.get('vehicle_info'),
+            special_requests=guest.get('special_requests'),
+            total_amount=site.price_per_night * num_nights,
+            status='pending',
+            payment_status='pending'
+        )
+        for site, site_occupants, site_vehicles in zip(ordered, occupants, vehicles)
+    ]
+    db.session.add_all(reservations)
+    db.session.flush()
+    return reservations
+
+
+def cancel_reservations(reservation_ids=None, campground_id=None, site_ids=None,
+                        start_date=None, end_date=None, reason=None):
+    """Cancel active reservations by id, or by site/campground and night range.
+
+    The range form cancels every stay with a night between start_date and
+    end_date inclusive. Returns (id, site_id, arrival_date, departure_date,
+    stripe_session_id, payment_status) rows for the cancelled reservations; pass
+    them to unpaid_checkout_sessions() to find the Checkout Sessions to expire.
+    """
+    stmt = update(Reservation).where(Reservation.status.in_(ACTIVE_STATUSES))
+
+    if reservation_ids:
+        stmt = stmt.where(Reservation.id.in_(reservation_ids))
+    elif start_date and end_date and (campground_id or site_ids):
+        if start_date > end_date:
+            raise ValueError('end_date must not be before start_date')
+        stmt = stmt.where(
+            Reservation.arrival_date <= end_date,
+            Reservation.departure_date > start_date
+        )
+        if site_ids:
+            stmt = stmt.where(Reservation.site_id.in_(site_ids))
+        else:
+            stmt = stmt.where(Reservation.site_id.in_(
+                db.select(Site.id).where(Site.campground_id == campground_id)
+            ))
+    else:
+        raise ValueError('Provide reservation_ids, or start_date, end_date and campground_id or site_ids')
+
+    values = {'status': 'cancelled', 'updated_at': datetime.utcnow()}
+    if reason:
+        values['notes'] = func.coalesce(Reservation.notes + '\n', '') + f'Cancelled: {reason}'
+
+    result = db.session.execute(
+        stmt.values(**values).returning(
+            Reservation.id, Reservation.site_id, Reservation.arrival_date, Reservation.departure_date,
+            Reservation.stripe_session_id, Reservation.payment_status
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    return result.all()
+
+
+def unpaid_checkout_sessions(rows):
+    """Checkout Sessions of cancelled holds whose guest may still be paying"""
+    return sorted({
+        row.stripe_session_id for row in rows
+        if row.stripe_session_id and row.payment_status == 'pending'
+    })
+
+
+def move_reservations(moves):
+    """Move reservations to other sites, keeping their dates.
+
+    moves is a list of (reservation_id, site_id) pairs. All target stays are
+    checked together, so swapping two guests between sites is allowed. Returns
+    a Move for each reservation.
+    """
+    if not moves:
+        return []
+
+    targets = dict(moves)
+    reservations = Reservation.query.filter(
+        Reservation.id.in_(targets.keys())
+    ).with_for_update().all()
+
+    missing = set(targets) - {reservation.id for reservation in reservations}
+    if missing:
+        raise ValueError(f'Unknown reservation id(s): {sorted(missing)}')
+
+    inactive = [r.id for r in reservations if r.status not in ACTIVE_STATUSES]
+    if inactive:
+        raise ValueError(f'Only pending or confirmed reservations can be moved: {inactive}')
+
+    sites = lock_sites(set(targets.values()))
+    stays = [
+        Stay(targets[r.id], r.arrival_date, r.departure_date, r.id)
+        for r in reservations
+    ]
+
+    conflicts = find_conflicts(stays, sites)
+    if conflicts:
+        raise ReservationConflict(conflicts)
+
+    moved = [
+        Move(r.id, r.site_id, targets[r.id], r.arrival_date, r.departure_date)
+        for r in reservations
+    ]
+    now = datetime.utcnow()
+    db.session.execute(
+        update(Reservation),
+        [{'id': r.id, 'site_id': targets[r.id], 'updated_at': now} for r in reservations]
+    )
+    # Feeds of the old sites learn about the move from here
+    left = [
+        {'reservation_id': move.id, 'from_site_id': move.old_site_id, 'to_site_id': move.site_id, 'moved_at': now}
+        for move in moved if move.old_site_id != move.site_id
+    ]
+    if left:
+        db.session.execute(insert(ReservationMove), left)
+    return moved
+
+
+def block_dates(start_date, end_date, reason=None, campground_id=None, site_ids=None,
+                cancel_overlapping=False):
+    """Create BlockedDate rows and optionally cancel the stays they overlap.
+
+    With site_ids one block is created per site; otherwise a single block covers
+    the whole campground. Returns (block_ids, cancelled_rows).
+    """
+    if start_date > end_date:
+        raise ValueError('end_date must not be before start_date')
+    if not (campground_id or site_ids):
+        raise ValueError('Provide campground_id or site_ids')
+
+    if site_ids:
+        sites = lock_sites(set(site_ids))
+        rows = [
+            {'site_id': site.id, 'campground_id': site.campground_id}
+            for site in sites.values()
+        ]
+    else:
+        if db.session.get(Campground, campground_id) is None:
+            raise ValueError(f'Unknown campground id: {campground_id}')
+        rows = [{'site_id': None, 'campground_id': campground_id}]
+
+    now = datetime.utcnow()
+    for row in rows:
+        row.update(start_date=start_date, end_date=end_date, reason=reason, created_at=now)
+
+    result = db.session.execute(insert(BlockedDate).returning(BlockedDate.id, sort_by_parameter_order=True), rows)
+    block_ids = [row.id for row in result]
+
+    cancelled = []
+    if cancel_overlapping:
+        cancelled = cancel_reservations(
+            campground_id=campground_id,
+            site_ids=site_ids,
+            start_date=start_date,
+            end_date=end_date,
+            reason=reason or 'Site closed'
+        )
+
+    return block_ids, cancelled
+
+
+def expire_pending_reservations(hold_minutes, site_ids=None):
+    """Cancel pending holds whose checkout window has passed.
+
+    Returns (id, site_id, arrival_date, departure_date) rows for the expired
+    reservations. Pass site_ids to only sweep the sites about to be booked.
+    Waitlist offers have their own deadline and are expired by waitlist.py.
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=hold_minutes + HOLD_GRACE_MINUTES)
+    stmt = update(Reservation).where(
+        Reservation.status == 'pending',
+        or_(Reservation.created_by.is_(None), Reservation.created_by != 'waitlist'),
+        Reservation.created_at < cutoff
+    )
+    if site_ids:
+        stmt = stmt.where(Reservation.site_id.in_(site_ids))
+
+    result = db.session.execute(
+        stmt.values(status='cancelled', payment_status='expired', updated_at=datetime.utcnow()).returning(
+            Reservation.id, Reservation.site_id, Reservation.arrival_date, Reservation.departure_date
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    return result.all()
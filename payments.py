@@ -0,0 +1,54 @@
+"""Stripe Checkout helpers
+
+stripe is imported on first use so CLI jobs and worker boot don't pay for it.
+"""
+from flask import current_app, url_for
+
+
+def get_stripe():
+    """Import and configure the Stripe client on first use"""
+    import stripe
+
+    stripe.api_key = current_app.config['STRIPE_SECRET_KEY']
+    return stripe
+
+
+def create_checkout_session(reservations, expires_at):
+    """Create one Stripe Checkout Session paying for one or more pending reservations"""
+    first = reservations[0]
+    return get_stripe().checkout.Session.create(
+        payment_method_types=['card'],
+        line_items=[{
+            'price_data': {
+                'currency': 'usd',
+                'unit_amount': int(reservation.total_amount * 100),  # Convert to cents
+                'product_data': {
+                    'name': f'{reservation.site.campground.name} - Site {reservation.site.site_number}',
+                    'description': f'{reservation.num_nights} nights: {reservation.arrival_date} to {reservation.departure_date}',
+                },
+            },
+            'quantity': 1,
+        } for reservation in reservations],
+        mode='payment',
+        success_url=url_for('public.payment_success', reservation_id=first.id, _external=True) + '?session_id={CHECKOUT_SESSION_ID}',
+        cancel_url=url_for('public.payment_cancel', reservation_id=first.id, _external=True),
+        customer_email=first.customer_email,
+        metadata={
+            'reservation_id': first.id,
+            'reservation_ids': ','.join(str(reservation.id) for reservation in reservations)
+        },
+        expires_at=int(expires_at.timestamp())
+    )
+
+
+def expire_checkout_sessions(session_ids):
+    """Expire open Checkout Sessions so holds cancelled by staff can no longer be paid"""
+    if not session_ids:
+        return
+    stripe = get_stripe()
+    for session_id in session_ids:
+        try:
+            stripe.checkout.Session.expire(session_id)
+        except stripe.error.StripeError as e:
+            # Already paid or expired; payment_success won't confirm a cancelled hold
+            current_app.logger.warning(f"Could not expire Checkout Session {session_id}: {e}")
@@ -0,0 +1,252 @@
+"""Token-bucket rate limiting and booking admission control
+
+Each limited endpoint has a bucket per client IP and one per browser session,
+refilled at the configured rate ("30/minute") up to the same burst size. A
+request that finds either bucket empty gets a small 429 with Retry-After before
+the view touches the database. Booking POSTs are also capped per worker process
+(BOOKING_CONCURRENCY in flight) and to one in flight per session, so a burst of
+checkouts cannot tie up every gunicorn thread in Stripe calls.
+
+RATE_LIMIT_URL selects where buckets live:
+    memory:// (default)     per-process dict; each worker limits on its own
+    redis://host:6379/0     a Redis-compatible server shared by all workers
+"""
+import secrets
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request, session
+from werkzeug.exceptions import TooManyRequests
+
+import metrics
+
+EXTENSION_KEY = 'rate_limit'
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+# Memory buckets are pruned once there are this many, dropping the full ones
+MAX_MEMORY_BUCKETS = 10000
+
+# A per-session booking slot is released after this long even if the worker died
+INFLIGHT_TTL_SECONDS = 60
+
+metrics.describe('rate_limit_requests_total', 'Rate-limited requests by limit, key scope and result')
+metrics.describe('rate_limit_inflight_rejections_total', 'Booking requests rejected by the concurrency limits')
+metrics.describe('rate_limit_bookings_in_flight', 'Booking requests being processed by this worker', 'gauge')
+
+
+def parse_rate(value):
+    """Parse "30/minute" into (tokens per second, burst size)"""
+    count, _, period = value.partition('/')
+    try:
+        count = int(count)
+        seconds = PERIODS[period.strip() or 'second']
+    except (KeyError, ValueError):
+        raise ValueError(f'Invalid rate limit {value!r}; use e.g. "30/minute"')
+    return count / seconds, count
+
+
+class MemoryBackend:
+    """Process-local buckets and in-flight counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._inflight = {}
+
+    def take(self, key, rate, burst):
+        """Take a token; returns seconds until one is available (0 when allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self._buckets) > MAX_MEMORY_BUCKETS:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # A bucket that has refilled completely is the same as a missing one
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+
+    def acquire(self, key, limit):
+        with self._lock:
+            count, expires_at = self._inflight.get(key, (0, 0))
+            if expires_at < time.monotonic():
+                count = 0
+            if count >= limit:
+                return False
+            self._inflight[key] = (count + 1, time.monotonic() + INFLIGHT_TTL_SECONDS)
+            return True
+
+    def release(self, key):
+        with self._lock:
+            count, expires_at = self._inflight.pop(key, (0, 0))
+            if count > 1:
+                self._inflight[key] = (count - 1, expires_at)
+
+
+# Refill and take atomically; returns the wait in milliseconds (0 when allowed)
+REDIS_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / rate * 1000)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return wait
+"""
+
+
+class RedisBackend:
+    """Buckets and in-flight counters in a Redis-compatible server"""
+
+    def __init__(self, url):
+        import redis  # optional dependency, only needed for this backend
+
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(REDIS_TAKE_SCRIPT)
+
+    def take(self, key, rate, burst):
+        wait_ms = self._take(keys=[f'ratelimit:{key}'], args=[rate, burst, time.time()])
+        return int(wait_ms) / 1000
+
+    def acquire(self, key, limit):
+        key = f'ratelimit:inflight:{key}'
+        pipe = self._client.pipeline()
+        pipe.incr(key)
+        pipe.expire(key, INFLIGHT_TTL_SECONDS)
+        count = pipe.execute()[0]
+        if count > limit:
+            self._client.decr(key)
+            return False
+        return True
+
+    def release(self, key):
+        self._client.decr(f'ratelimit:inflight:{key}')
+
+
+def create_backend(url):
+    if url.startswith('redis://') or url.startswith('rediss://'):
+        return RedisBackend(url)
+    return MemoryBackend()
+
+
+def get_backend():
+    """Return this process's backend, creating it on first use (after fork)"""
+    state = current_app.extensions[EXTENSION_KEY]
+    if state['backend'] is None:
+        with state['lock']:
+            if state['backend'] is None:
+                state['backend'] = create_backend(current_app.config['RATE_LIMIT_URL'])
+    return state['backend']
+
+
+def session_key():
+    """Stable id for the browser session, assigned on first use"""
+    if 'rate_limit_id' not in session:
+        session['rate_limit_id'] = secrets.token_urlsafe(12)
+    return session['rate_limit_id']
+
+
+def too_many_requests(retry_after, json_errors):
+    """Build a cheap 429; Retry-After is rounded up to whole seconds"""
+    retry_after = max(1, int(retry_after + 0.999))
+    if json_errors:
+        response = jsonify({'error': 'Too many requests', 'retry_after': retry_after})
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
+    return TooManyRequests(retry_after=retry_after).get_response()
+
+
+def check_rate_limit(name):
+    """Take a token from the IP and session buckets for a limit; returns the wait (0 = allowed)"""
+    backend = get_backend()
+    wait = 0
+    for scope, key in (('ip', request.remote_addr), ('session', session_key())):
+        rate, burst = parse_rate(current_app.config[f'RATE_LIMIT_{name.upper()}_{scope.upper()}'])
+        scope_wait = backend.take(f'{name}:{scope}:{key}', rate, burst)
+        metrics.inc('rate_limit_requests_total', limit=name, scope=scope,
+                    result='limited' if scope_wait else 'allowed')
+        wait = max(wait, scope_wait)
+    return wait
+
+
+def rate_limited(name, methods=None, json_errors=True):
+    """Apply the RATE_LIMIT_<NAME>_IP/_SESSION limits to a view (optionally only some methods)"""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if current_app.config['RATE_LIMIT_ENABLED'] and (methods is None or request.method in methods):
+                wait = check_rate_limit(name)
+                if wait:
+                    return too_many_requests(wait, json_errors)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def booking_slot(f):
+    """Admit a booking POST only while this worker and this session have a free slot"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_app.config['RATE_LIMIT_ENABLED']:
+            return f(*args, **kwargs)
+        if request.method != 'POST':
+            # Give the booking form a session id so its POSTs share one slot
+            session_key()
+            return f(*args, **kwargs)
+
+        state = current_app.extensions[EXTENSION_KEY]
+        if not state['booking_slots'].acquire(blocking=False):
+            metrics.inc('rate_limit_inflight_rejections_total', scope='worker')
+            return too_many_requests(1, json_errors=False)
+
+        backend = get_backend()
+        session_slot = f'booking:session:{session_key()}'
+        try:
+            if not backend.acquire(session_slot, 1):
+                metrics.inc('rate_limit_inflight_rejections_total', scope='session')
+                return too_many_requests(1, json_errors=False)
+            try:
+                with state['lock']:
+                    state['bookings_in_flight'] += 1
+                    metrics.set_gauge('rate_limit_bookings_in_flight', state['bookings_in_flight'])
+                return f(*args, **kwargs)
+            finally:
+                with state['lock']:
+                    state['bookings_in_flight'] -= 1
+                    metrics.set_gauge('rate_limit_bookings_in_flight', state['bookings_in_flight'])
+                backend.release(session_slot)
+        finally:
+            state['booking_slots'].release()
+    return decorated_function
+
+
+def init_app(app):
+    """Register the limiter with an app; the backend connects lazily per process"""
+    app.config.setdefault('RATE_LIMIT_ENABLED', True)
+    app.config.setdefault('RATE_LIMIT_URL', 'memory://')
+    app.config.setdefault('BOOKING_CONCURRENCY', 4)
+    app.extensions[EXTENSION_KEY] = {
+        'backend': None,
+        'lock': threading.Lock(),
+        'booking_slots': threading.BoundedSemaphore(app.config['BOOKING_CONCURRENCY']),
+        'bookings_in_flight': 0,
+    }
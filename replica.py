@@ -0,0 +1,43 @@
+"""Optional read-replica routing for read-only endpoints
+
+When DATABASE_REPLICA_URL is set, views decorated with @replica_read run their
+queries against the replica. A guest who has just written (booked, paid or
+cancelled) is pinned to the primary for REPLICA_PIN_SECONDS so they always see
+their own changes, even if the replica lags behind.
+"""
+import time
+from functools import wraps
+from flask import current_app, g, has_app_context, session
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND_KEY = 'replica'
+PIN_SESSION_KEY = 'replica_pinned_until'
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica engine when the view asks for it"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context() and g.get('use_replica'):
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def pin_to_primary():
+    """Keep this browser session on the primary until the replica has caught up"""
+    session[PIN_SESSION_KEY] = time.time() + current_app.config['REPLICA_PIN_SECONDS']
+
+
+def is_pinned_to_primary():
+    return session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def replica_read(f):
+    """Route a read-only view's queries to the replica unless the guest is pinned"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.use_replica = not is_pinned_to_primary()
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,158 @@
+"""Indexed reservation lookup for the admin reservations page"""
+import re
+from sqlalchemy import false, func, literal_column, or_, text
+
+from models import db, ArchivedReservation, Reservation
+
+# Maximum rows returned for a search so the admin page stays fast
+SEARCH_RESULT_LIMIT = 100
+
+# Trigram indexes cannot help with fewer characters than this
+MIN_TRIGRAM_LENGTH = 3
+
+CONFIRMATION_CODE_RE = re.compile(r'^BS0*(\d+)$', re.IGNORECASE)
+# Largest reservation id (a PostgreSQL integer); bigger codes can't match anything
+MAX_RESERVATION_ID = 2**31 - 1
+# Digits and phone punctuation, with at least one digit ("--" is not a phone number)
+PHONE_RE = re.compile(r'^(?=.*\d)[\d\s().+-]+$')
+
+# PostgreSQL only uses an expression index when the query repeats the indexed
+# expression with literal (not bound) arguments
+POSTGRES_PHONE_DIGITS = "regexp_replace(customer_phone, '\\D', '', 'g')"
+POSTGRES_TS_CONFIG = "'simple'"
+
+# SQLite has no regexp_replace, so strip the usual phone punctuation by hand
+SQLITE_PHONE_DIGITS = (
+    "replace(replace(replace(replace(replace(replace({column}, "
+    "'(', ''), ')', ''), '-', ''), ' ', ''), '.', ''), '+', '')"
+)
+
+POSTGRES_SEARCH_INDEXES = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+    statement.format(table=table)
+    for table in (Reservation.__tablename__, ArchivedReservation.__tablename__)
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_{table}_customer_name_trgm "
+        "ON {table} USING gin (customer_name gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_{table}_customer_name_fts "
+        f"ON {{table}} USING gin (to_tsvector({POSTGRES_TS_CONFIG}, customer_name))",
+        "CREATE INDEX IF NOT EXISTS ix_{table}_customer_phone_trgm "
+        f"ON {{table}} USING gin (({POSTGRES_PHONE_DIGITS}) gin_trgm_ops)",
+    )
+]
+
+SQLITE_SEARCH_INDEXES = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS reservations_fts "
+    "USING fts5(customer_name, phone_digits, tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS reservations_fts_insert AFTER INSERT ON reservations BEGIN "
+    "INSERT INTO reservations_fts (rowid, customer_name, phone_digits) "
+    f"VALUES (new.id, new.customer_name, {SQLITE_PHONE_DIGITS.format(column='new.customer_phone')}); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS reservations_fts_update "
+    "AFTER UPDATE OF customer_name, customer_phone ON reservations BEGIN "
+    "UPDATE reservations_fts SET customer_name = new.customer_name, "
+    f"phone_digits = {SQLITE_PHONE_DIGITS.format(column='new.customer_phone')} "
+    "WHERE rowid = old.id; "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS reservations_fts_delete AFTER DELETE ON reservations BEGIN "
+    "DELETE FROM reservations_fts WHERE rowid = old.id; "
+    "END",
+    # Backfill rows that existed before the index was created
+    "INSERT INTO reservations_fts (rowid, customer_name, phone_digits) "
+    f"SELECT id, customer_name, {SQLITE_PHONE_DIGITS.format(column='customer_phone')} "
+    "FROM reservations WHERE id NOT IN (SELECT rowid FROM reservations_fts)",
+]
+
+
+def ensure_search_indexes():
+    """Create the dialect-specific name/phone search indexes (idempotent)"""
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        statements = POSTGRES_SEARCH_INDEXES
+    elif dialect == 'sqlite':
+        statements = SQLITE_SEARCH_INDEXES
+    else:
+        return
+
+    with db.engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+
+
+def _sqlite_fts_available():
+    """Check whether the FTS5 shadow table has been created"""
+    row = db.session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reservations_fts'"
+    )).first()
+    return row is not None
+
+
+def _fts_phrase(value):
+    """Quote a value as a single FTS5 phrase"""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _name_filter(term, model):
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        return or_(
+            model.customer_name.ilike(f'%{term}%'),
+            func.to_tsvector(literal_column(POSTGRES_TS_CONFIG), model.customer_name).op('@@')(
+                func.plainto_tsquery(literal_column(POSTGRES_TS_CONFIG), term)
+            )
+        )
+
+    # The FTS5 table only covers live reservations; archive searches use LIKE
+    if dialect == 'sqlite' and model is Reservation and len(term) >= MIN_TRIGRAM_LENGTH and _sqlite_fts_available():
+        return Reservation.id.in_(
+            text("SELECT rowid FROM reservations_fts WHERE customer_name MATCH :name_phrase")
+            .bindparams(name_phrase=_fts_phrase(term))
+        )
+
+    return model.customer_name.ilike(f'%{term}%')
+
+
+def _phone_filter(digits, model):
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        return literal_column(POSTGRES_PHONE_DIGITS).like(f'%{digits}%')
+
+    if dialect == 'sqlite' and model is Reservation and len(digits) >= MIN_TRIGRAM_LENGTH and _sqlite_fts_available():
+        return Reservation.id.in_(
+            text("SELECT rowid FROM reservations_fts WHERE phone_digits MATCH :phone_phrase")
+            .bindparams(phone_phrase=_fts_phrase(digits))
+        )
+
+    if dialect == 'sqlite':
+        column = f'{model.__tablename__}.customer_phone'
+        return literal_column(SQLITE_PHONE_DIGITS.format(column=column)).like(f'%{digits}%')
+
+    return model.customer_phone.like(f'%{digits}%')
+
+
+def search_reservations(query, term, model=Reservation):
+    """Narrow a Reservation (or ArchivedReservation) query by confirmation code, email, name or phone.
+
+    Confirmation codes and email addresses are exact, indexed lookups. Names
+    and phone numbers use pg_trgm/full-text indexes on PostgreSQL and an FTS5
+    trigram table on SQLite.
+    """
+    term = term.strip()
+
+    code_match = CONFIRMATION_CODE_RE.match(term)
+    if code_match:
+        reservation_id = int(code_match.group(1))
+        if reservation_id > MAX_RESERVATION_ID:
+            return query.filter(false())
+        return query.filter(model.id == reservation_id)
+
+    if '@' in term:
+        return query.filter(func.lower(model.customer_email) == term.lower())
+
+    if PHONE_RE.match(term):
+        # Compare digits only so "(270) 555-0134" matches "270.555.0134"
+        return query.filter(_phone_filter(re.sub(r'\D', '', term), model))
+
+    return query.filter(_name_filter(term, model))
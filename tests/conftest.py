@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from config import Config  # noqa: E402
+from factory import create_app  # noqa: E402
+from models import db  # noqa: E402
+
+
+class TestConfig(Config):
+    TESTING = True
+    SECRET_KEY = 'test'
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+    AVAILABILITY_CACHE_URL = 'memory://'
+    HOLD_SWEEP_SECONDS = 0
+    RATE_LIMIT_ENABLED = True
+    RATE_LIMIT_URL = 'memory://'
+    RATE_LIMIT_AVAILABILITY_IP = '3/minute'
+    RATE_LIMIT_AVAILABILITY_SESSION = '100/minute'
+    RATE_LIMIT_BOOKING_IP = '100/minute'
+    RATE_LIMIT_BOOKING_SESSION = '2/minute'
+    TRUSTED_PROXY_COUNT = 0
+
+
+@pytest.fixture
+def make_app():
+    """Build an app from TestConfig with some settings overridden"""
+    def make(**overrides):
+        config = type('Config', (TestConfig,), overrides)
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
@@ -0,0 +1,110 @@
+import pytest
+
+import rate_limit
+from rate_limit import MemoryBackend, parse_rate
+
+AVAILABILITY_URL = '/api/campgrounds/1/availability'
+
+
+def test_parse_rate():
+    assert parse_rate('30/minute') == (0.5, 30)
+    assert parse_rate('5/second') == (5, 5)
+    assert parse_rate('10') == (10, 10)
+    with pytest.raises(ValueError):
+        parse_rate('ten/minute')
+    with pytest.raises(ValueError):
+        parse_rate('10/day')
+
+
+def test_memory_bucket_refills(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now[0])
+    backend = MemoryBackend()
+
+    assert backend.take('key', 1, 2) == 0
+    assert backend.take('key', 1, 2) == 0
+    assert backend.take('key', 1, 2) == pytest.approx(1)
+
+    now[0] += 0.5
+    assert backend.take('key', 1, 2) == pytest.approx(0.5)
+    now[0] += 1
+    assert backend.take('key', 1, 2) == 0
+
+
+def test_memory_inflight_slots():
+    backend = MemoryBackend()
+    assert backend.acquire('slot', 1)
+    assert not backend.acquire('slot', 1)
+    backend.release('slot')
+    assert backend.acquire('slot', 1)
+
+
+def test_availability_limit_returns_json_429(app):
+    client = app.test_client()
+    for _ in range(3):
+        assert client.get(AVAILABILITY_URL).status_code == 400  # missing dates, but allowed
+
+    response = client.get(AVAILABILITY_URL)
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    assert response.get_json()['retry_after'] == int(response.headers['Retry-After'])
+
+
+def test_ip_bucket_is_shared_across_sessions(app):
+    for _ in range(3):
+        app.test_client().get(AVAILABILITY_URL)
+
+    assert app.test_client().get(AVAILABILITY_URL).status_code == 429
+    other_ip = app.test_client().get(AVAILABILITY_URL, environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert other_ip.status_code == 400
+
+
+def test_forwarded_client_ips_get_their_own_buckets(make_app):
+    app = make_app(TRUSTED_PROXY_COUNT=1)
+    client = app.test_client()
+    for _ in range(3):
+        client.get(AVAILABILITY_URL, headers={'X-Forwarded-For': '203.0.113.1'})
+
+    assert client.get(AVAILABILITY_URL, headers={'X-Forwarded-For': '203.0.113.1'}).status_code == 429
+    assert client.get(AVAILABILITY_URL, headers={'X-Forwarded-For': '203.0.113.2'}).status_code == 400
+
+
+def test_booking_session_limit_only_applies_to_posts(app):
+    client = app.test_client()
+    for _ in range(5):
+        assert client.get('/book/1').status_code == 404  # no such site, but never limited
+
+    assert client.post('/book/1').status_code == 404
+    assert client.post('/book/1').status_code == 404
+    response = client.post('/book/1')
+    assert response.status_code == 429
+    assert 'Retry-After' in response.headers
+    assert response.mimetype == 'text/html'
+
+
+def test_waitlist_checkout_shares_the_booking_limit(app):
+    client = app.test_client()
+    assert client.post('/waitlist/missing/checkout').status_code == 404
+    assert client.post('/book/1').status_code == 404
+    assert client.post('/waitlist/missing/checkout').status_code == 429
+
+
+def test_booking_slot_rejects_a_second_submit_in_flight(app):
+    client = app.test_client()
+    client.get('/book/1')
+    with client.session_transaction() as session:
+        session_key = session['rate_limit_id']
+
+    with app.app_context():
+        backend = rate_limit.get_backend()
+        assert backend.acquire(f'booking:session:{session_key}', 1)
+        assert client.post('/book/1').status_code == 429
+        backend.release(f'booking:session:{session_key}')
+
+    assert client.post('/book/1').status_code == 404
+
+
+def test_limits_can_be_disabled(make_app):
+    client = make_app(RATE_LIMIT_ENABLED=False).test_client()
+    for _ in range(10):
+        assert client.get(AVAILABILITY_URL).status_code == 400
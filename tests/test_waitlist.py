@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+
+import pytest
+
+import waitlist
+from models import db, Campground, Reservation, Site, WaitlistEntry
+
+TODAY = date.today().toordinal()
+
+
+def test_free_gaps_empty_site():
+    assert list(waitlist.free_gaps([], TODAY + 5, TODAY + 8)) == [(TODAY, None)]
+
+
+def test_free_gaps_stop_at_neighbouring_bookings():
+    intervals = [(TODAY + 2, TODAY + 5), (TODAY + 10, TODAY + 12)]
+
+    assert list(waitlist.free_gaps(intervals, TODAY + 6, TODAY + 8)) == [(TODAY + 5, TODAY + 10)]
+    assert list(waitlist.free_gaps(intervals, TODAY, TODAY + 2)) == [(TODAY, TODAY + 2)]
+    assert list(waitlist.free_gaps(intervals, TODAY + 8, TODAY + 14)) == [
+        (TODAY + 5, TODAY + 10), (TODAY + 12, None)
+    ]
+
+
+@pytest.fixture
+def site(app):
+    with app.app_context():
+        campground = Campground(name='Pine Lake')
+        site = Site(campground=campground, site_number='A1', site_type='RV Electric', price_per_night=40)
+        db.session.add(site)
+        db.session.commit()
+        yield site
+
+
+def days(offset):
+    return date.today() + timedelta(days=offset)
+
+
+def add_entry(site, name, arrival, departure):
+    entry = WaitlistEntry(
+        token=waitlist.new_token(), campground_id=site.campground_id,
+        arrival_date=days(arrival), departure_date=days(departure), status='waiting',
+        customer_name=name, customer_email=f'{name}@example.com', customer_phone='555-0100',
+        num_occupants=2, num_vehicles=1
+    )
+    db.session.add(entry)
+    db.session.flush()
+    return entry
+
+
+def add_booking(site, arrival, departure):
+    db.session.add(Reservation(
+        site_id=site.id, customer_name='Booked', customer_email='booked@example.com',
+        customer_phone='555-0101', arrival_date=days(arrival), departure_date=days(departure),
+        num_nights=departure - arrival, num_occupants=2, num_vehicles=1, total_amount=0,
+        status='confirmed', payment_status='paid'
+    ))
+    db.session.flush()
+
+
+def test_oldest_entry_is_offered_and_blocks_overlapping_entries(site):
+    first = add_entry(site, 'first', 5, 8)
+    overlapping = add_entry(site, 'overlapping', 6, 9)
+    later = add_entry(site, 'later', 9, 11)
+
+    offers = waitlist.match_freed_dates(site, [(days(5), days(11))])
+
+    assert [offer.customer_name for offer in offers] == ['first', 'later']
+    assert (first.status, overlapping.status, later.status) == ('offered', 'waiting', 'offered')
+    assert first.offered_reservation_id == offers[0].id
+    assert offers[0].status == 'pending' and offers[0].created_by == 'waitlist'
+
+
+def test_entries_must_fit_between_neighbouring_bookings(site):
+    add_booking(site, 2, 5)
+    add_booking(site, 10, 12)
+    too_long = add_entry(site, 'too_long', 6, 11)
+    fits = add_entry(site, 'fits', 5, 10)
+    outside = add_entry(site, 'outside', 12, 14)
+
+    offers = waitlist.match_freed_dates(site, [(days(6), days(8))])
+
+    assert [offer.customer_name for offer in offers] == ['fits']
+    assert (too_long.status, fits.status, outside.status) == ('waiting', 'offered', 'waiting')
+
+
+def test_entries_must_want_what_the_site_has(site):
+    wants_pullthru = add_entry(site, 'pullthru', 5, 8)
+    wants_pullthru.features = 'pullthru'
+    add_entry(site, 'electric', 5, 8).features = 'electric'
+
+    offers = waitlist.match_freed_dates(site, [(days(5), days(8))])
+
+    assert [offer.customer_name for offer in offers] == ['electric']
+    assert wants_pullthru.status == 'waiting'
@@ -1,10 +1,10 @@
 """Update campground locations in database"""
-from app import app, db
-from models import Campground
+from factory import app_context
+from models import db, Campground
 
 def update_locations():
     """Update campground location information"""
-    with app.app_context():
+    with app_context():
         # Update North Fork
         north_fork = Campground.query.filter_by(name='North Fork').first()
         if north_fork:
@@ -0,0 +1,376 @@
+"""Admin pages and the admin operations API"""
+import os
+from datetime import date, datetime, timedelta
+from functools import wraps
+from flask import Blueprint, abort, flash, jsonify, redirect, render_template, request, session, url_for
+from sqlalchemy.orm import joinedload
+
+from archive import fetch_reservations
+from events import block_changes, notify_availability_changed, reservation_changes
+from manifest import MANIFEST_KINDS, daily_manifest, refresh_manifest
+from models import db, ArchivedReservation, Campground, Site, Reservation
+from operations import (
+    ReservationConflict, block_dates, cancel_reservations, create_reservations, move_reservations,
+    unpaid_checkout_sessions
+)
+from payments import expire_checkout_sessions
+from search import search_reservations, SEARCH_RESULT_LIMIT
+
+bp = Blueprint('admin', __name__)
+
+# Most rows the unfiltered reservations list shows (newest arrivals first)
+RESERVATION_LIST_LIMIT = 500
+
+
+# Admin authentication decorator
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('admin_logged_in'):
+            flash('Please log in to access the admin panel.', 'warning')
+            return redirect(url_for('admin.login'))
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# Admin API authentication decorator (JSON clients get a 401 instead of a redirect)
+def admin_api_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not session.get('admin_logged_in'):
+            return jsonify({'error': 'Admin login required'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def parse_date(value, field):
+    """Parse a YYYY-MM-DD request value, naming the field on error"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a date in YYYY-MM-DD format')
+
+
+def parse_id(value, field):
+    """Parse an integer id from a request value, naming the field on error"""
+    if isinstance(value, bool):
+        raise ValueError(f'{field} must be an integer id')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be an integer id')
+
+
+def parse_ids(value, field):
+    """Parse an optional list of integer ids"""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        try:
+            return [parse_id(item, field) for item in value]
+        except ValueError:
+            pass
+    raise ValueError(f'{field} must be a list of integer ids')
+
+
+def parse_objects(value, field):
+    """Check that a request value is a list of JSON objects"""
+    if not isinstance(value, list) or not all(isinstance(item, dict) for item in value):
+        raise ValueError(f'{field} must be a list of objects')
+    return value
+
+
+def json_body():
+    """The request's JSON object, or {} when the body is missing or not JSON"""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError('The request body must be a JSON object')
+    return data
+
+
+def run_admin_operation(operation, after_commit=None):
+    """Run an admin operation in one transaction and map failures to JSON errors.
+
+    The operation returns (response, availability changes); changes are
+    published, and after_commit() called, only after the commit succeeds.
+    """
+    try:
+        response, changes = operation()
+        db.session.commit()
+        notify_availability_changed(changes)
+        if after_commit:
+            after_commit()
+        return response
+    except ReservationConflict as e:
+        db.session.rollback()
+        return jsonify({'error': 'Conflicting reservations', 'conflicts': e.conflicts}), 409
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+
+
+@bp.route('/admin/login', methods=['GET', 'POST'])
+def login():
+    """Admin login page"""
+    if request.method == 'POST':
+        password = request.form.get('password')
+
+        # Check password against environment variable
+        admin_password = os.environ.get('ADMIN_PASSWORD', 'admin123')  # Default for development
+
+        if password == admin_password:
+            session['admin_logged_in'] = True
+            flash('Successfully logged in!', 'success')
+            return redirect(url_for('admin.dashboard'))
+        else:
+            flash('Invalid password. Please try again.', 'error')
+
+    return render_template('admin/login.html')
+
+
+@bp.route('/admin/logout')
+def logout():
+    """Admin logout"""
+    session.pop('admin_logged_in', None)
+    flash('You have been logged out.', 'info')
+    return redirect(url_for('public.index'))
+
+
+@bp.route('/admin')
+@admin_required
+def dashboard():
+    """Admin dashboard - simple authentication would be needed for production"""
+    # TODO: Add proper authentication
+
+    total_reservations = Reservation.query.count() + ArchivedReservation.query.count()
+    confirmed_reservations = Reservation.query.filter_by(status='confirmed').count()
+    pending_reservations = Reservation.query.filter_by(status='pending').count()
+
+    recent_reservations = Reservation.query.order_by(
+        Reservation.created_at.desc()
+    ).limit(10).all()
+
+    return render_template(
+        'admin/dashboard.html',
+        total_reservations=total_reservations,
+        confirmed_reservations=confirmed_reservations,
+        pending_reservations=pending_reservations,
+        recent_reservations=recent_reservations
+    )
+
+
+@bp.route('/admin/reservations')
+@admin_required
+def reservations():
+    """View all reservations"""
+    # TODO: Add proper authentication
+
+    campground_id = request.args.get('campground', type=int)
+    status = request.args.get('status')
+    search = request.args.get('q', '').strip()
+
+    def build_query(model):
+        query = model.query
+
+        if campground_id:
+            query = query.join(Site, model.site_id == Site.id).filter(Site.campground_id == campground_id)
+
+        if status:
+            query = query.filter(model.status == status)
+
+        if search:
+            query = search_reservations(query, search, model)
+
+        return query.options(
+            joinedload(model.site).joinedload(Site.campground)
+        ).order_by(model.arrival_date.desc()).limit(limit)
+
+    # Archived stays are only listed alongside live ones when searching or
+    # filtering by status; the plain list is the current season
+    limit = SEARCH_RESULT_LIMIT if search else RESERVATION_LIST_LIMIT
+    reservations = fetch_reservations(
+        build_query,
+        key=lambda reservation: reservation.arrival_date,
+        reverse=True,
+        status=status,
+        limit=limit,
+        archive=bool(search or status)
+    )
+    campgrounds = Campground.query.all()
+
+    return render_template(
+        'admin/reservations.html',
+        reservations=reservations,
+        campgrounds=campgrounds,
+        selected_campground=campground_id,
+        selected_status=status,
+        search=search,
+        limit=limit
+    )
+
+
+def manifest_request():
+    """Read the campground and day for a manifest page, defaulting to today"""
+    campgrounds = Campground.query.order_by(Campground.id).all()
+    campground_id = request.args.get('campground', type=int) or (campgrounds[0].id if campgrounds else None)
+    campground = next((cg for cg in campgrounds if cg.id == campground_id), None)
+    if campground is None:
+        abort(404)
+
+    try:
+        day = parse_date(request.args['date'], 'date') if request.args.get('date') else date.today()
+    except ValueError:
+        day = date.today()
+
+    # Pick up reservation changes the availability signal has not seen yet
+    refresh_manifest()
+    return campgrounds, campground, day
+
+
+@bp.route('/admin/manifest')
+@admin_required
+def manifest():
+    """Today's arrivals, departures and in-house guests for one campground"""
+    campgrounds, campground, day = manifest_request()
+
+    return render_template(
+        'admin/manifest.html',
+        campgrounds=campgrounds,
+        campground=campground,
+        day=day,
+        manifest=daily_manifest(campground.id, day),
+        kinds=MANIFEST_KINDS
+    )
+
+
+@bp.route('/admin/manifest/print')
+@admin_required
+def manifest_print():
+    """Self-contained manifest page for printing or saving to the gate house"""
+    campgrounds, campground, day = manifest_request()
+    num_days = min(max(request.args.get('days', 1, type=int), 1), 7)
+    days = [day + timedelta(days=offset) for offset in range(num_days)]
+
+    html = render_template(
+        'admin/manifest_print.html',
+        campground=campground,
+        days=[(manifest_day, daily_manifest(campground.id, manifest_day)) for manifest_day in days],
+        kinds=MANIFEST_KINDS,
+        generated_at=datetime.now()
+    )
+    headers = {}
+    if request.args.get('download'):
+        filename = f"manifest-{campground.name.lower().replace(' ', '-')}-{day.isoformat()}.html"
+        headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return html, 200, headers
+
+
+@bp.route('/admin/api/reservations', methods=['POST'])
+@admin_api_required
+def api_create_reservations():
+    """Create one reservation or a list of reservations (phone/admin bookings)"""
+    def operation():
+        data = json_body()
+        items = parse_objects(data.get('reservations', [data]), 'reservations')
+        for item in items:
+            item['site_id'] = parse_id(item.get('site_id'), 'site_id')
+            item['arrival_date'] = parse_date(item.get('arrival_date'), 'arrival_date')
+            item['departure_date'] = parse_date(item.get('departure_date'), 'departure_date')
+        created = create_reservations(items)
+        response = jsonify({
+            'created': len(created),
+            'reservation_ids': [row.id for row in created],
+            'confirmation_codes': [f"BS{row.id:06d}" for row in created]
+        }), 201
+        return response, reservation_changes(created, available=False)
+
+    return run_admin_operation(operation)
+
+
+@bp.route('/admin/api/reservations/cancel', methods=['POST'])
+@admin_api_required
+def api_cancel_reservations():
+    """Cancel reservations by id, or every stay at a campground/sites for a date range"""
+    # Guests still in Stripe Checkout for a cancelled hold must not be able to pay
+    unpaid = []
+
+    def operation():
+        data = json_body()
+        cancelled = cancel_reservations(
+            reservation_ids=parse_ids(data.get('reservation_ids'), 'reservation_ids'),
+            campground_id=parse_id(data['campground_id'], 'campground_id') if data.get('campground_id') else None,
+            site_ids=parse_ids(data.get('site_ids'), 'site_ids'),
+            start_date=parse_date(data['start_date'], 'start_date') if data.get('start_date') else None,
+            end_date=parse_date(data['end_date'], 'end_date') if data.get('end_date') else None,
+            reason=data.get('reason')
+        )
+        unpaid[:] = unpaid_checkout_sessions(cancelled)
+        response = jsonify({
+            'cancelled': len(cancelled),
+            'reservation_ids': [row.id for row in cancelled]
+        })
+        return response, reservation_changes(cancelled, available=True)
+
+    return run_admin_operation(operation, after_commit=lambda: expire_checkout_sessions(unpaid))
+
+
+@bp.route('/admin/api/reservations/move', methods=['POST'])
+@admin_api_required
+def api_move_reservations():
+    """Move reservations to other sites: {"moves": [{"reservation_id": 1, "site_id": 2}]}"""
+    def operation():
+        data = json_body()
+        moves = parse_objects(data.get('moves', [data]), 'moves')
+        pairs = [
+            (parse_id(move.get('reservation_id'), 'reservation_id'), parse_id(move.get('site_id'), 'site_id'))
+            for move in moves
+        ]
+        moved = move_reservations(pairs)
+        response = jsonify({
+            'moved': len(moved),
+            'reservations': [
+                {'reservation_id': move.id, 'from_site_id': move.old_site_id, 'to_site_id': move.site_id}
+                for move in moved
+            ]
+        })
+        vacated = [move._replace(site_id=move.old_site_id) for move in moved]
+        changes = reservation_changes(vacated, available=True) + reservation_changes(moved, available=False)
+        return response, changes
+
+    return run_admin_operation(operation)
+
+
+@bp.route('/admin/api/blocked-dates', methods=['POST'])
+@admin_api_required
+def api_block_dates():
+    """Block sites or a whole campground, optionally cancelling overlapping stays"""
+    unpaid = []
+
+    def operation():
+        data = json_body()
+        start_date = parse_date(data.get('start_date'), 'start_date')
+        end_date = parse_date(data.get('end_date'), 'end_date')
+        campground_id = parse_id(data['campground_id'], 'campground_id') if data.get('campground_id') else None
+        site_ids = parse_ids(data.get('site_ids'), 'site_ids')
+        block_ids, cancelled = block_dates(
+            start_date=start_date,
+            end_date=end_date,
+            reason=data.get('reason'),
+            campground_id=campground_id,
+            site_ids=site_ids,
+            cancel_overlapping=bool(data.get('cancel_reservations'))
+        )
+        unpaid[:] = unpaid_checkout_sessions(cancelled)
+        response = jsonify({
+            'blocked_date_ids': block_ids,
+            'cancelled': len(cancelled),
+            'cancelled_reservation_ids': [row.id for row in cancelled]
+        }), 201
+        changes = reservation_changes(cancelled, available=True) + block_changes(
+            start_date, end_date, campground_id=campground_id, site_ids=site_ids
+        )
+        return response, changes
+
+    return run_admin_operation(operation, after_commit=lambda: expire_checkout_sessions(unpaid))
@@ -0,0 +1,147 @@
+"""JSON availability API, live availability stream and metrics"""
+from datetime import datetime
+from flask import Blueprint, abort, current_app, jsonify, request, session
+
+import availability_cache
+import availability_stream
+import metrics
+from groups import available_groups
+from models import db, Site
+from rate_limit import rate_limited
+from replica import replica_read
+
+bp = Blueprint('api', __name__)
+
+
+@bp.route('/api/check-availability')
+@rate_limited('availability')
+@replica_read
+def check_availability():
+    """API endpoint to check site availability for date range"""
+    site_id = request.args.get('site_id', type=int)
+    arrival = request.args.get('arrival')
+    departure = request.args.get('departure')
+
+    if not all([site_id, arrival, departure]):
+        return jsonify({'error': 'Missing parameters'}), 400
+
+    try:
+        arrival_date = datetime.strptime(arrival, '%Y-%m-%d').date()
+        departure_date = datetime.strptime(departure, '%Y-%m-%d').date()
+
+        if arrival_date >= departure_date:
+            return jsonify({'available': False, 'error': 'Departure must be after arrival'}), 400
+
+        if arrival_date < datetime.now().date():
+            return jsonify({'available': False, 'error': 'Cannot book dates in the past'}), 400
+
+        site = Site.query.get_or_404(site_id)
+        is_available = availability_cache.is_site_available(site, arrival_date, departure_date)
+
+        num_nights = (departure_date - arrival_date).days
+        total_price = site.price_per_night * num_nights
+
+        return jsonify({
+            'available': is_available,
+            'num_nights': num_nights,
+            'price_per_night': site.price_per_night,
+            'total_price': total_price
+        })
+
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+
+
+@bp.route('/api/campgrounds/<int:campground_id>/availability')
+@rate_limited('availability')
+@replica_read
+def campground_availability(campground_id):
+    """Availability of every active site in a campground for a date range"""
+    arrival = request.args.get('arrival')
+    departure = request.args.get('departure')
+
+    if not all([arrival, departure]):
+        return jsonify({'error': 'Missing parameters'}), 400
+
+    try:
+        arrival_date = datetime.strptime(arrival, '%Y-%m-%d').date()
+        departure_date = datetime.strptime(departure, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+
+    if arrival_date >= departure_date:
+        return jsonify({'error': 'Departure must be after arrival'}), 400
+
+    if arrival_date < datetime.now().date():
+        return jsonify({'error': 'Cannot book dates in the past'}), 400
+
+    site_ids = [
+        row.id for row in db.session.query(Site.id).filter_by(campground_id=campground_id, active=True)
+    ]
+    if not site_ids:
+        abort(404)
+
+    available = availability_cache.check_availability(site_ids, arrival_date, departure_date)
+
+    return jsonify({
+        'num_nights': (departure_date - arrival_date).days,
+        'sites': {str(site_id): is_available for site_id, is_available in available.items()}
+    })
+
+
+@bp.route('/api/campgrounds/<int:campground_id>/groups')
+@rate_limited('availability')
+@replica_read
+def campground_groups(campground_id):
+    """Adjacent site groups in a campground that are entirely free for a date range"""
+    arrival = request.args.get('arrival')
+    departure = request.args.get('departure')
+
+    if not all([arrival, departure]):
+        return jsonify({'error': 'Missing parameters'}), 400
+
+    try:
+        arrival_date = datetime.strptime(arrival, '%Y-%m-%d').date()
+        departure_date = datetime.strptime(departure, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+
+    if arrival_date >= departure_date:
+        return jsonify({'error': 'Departure must be after arrival'}), 400
+
+    groups = available_groups(
+        campground_id, arrival_date, departure_date,
+        request.args.get('occupants', 0, type=int), request.args.get('vehicles', 0, type=int)
+    )
+    num_nights = (departure_date - arrival_date).days
+    return jsonify({
+        'num_nights': num_nights,
+        'groups': [{
+            'id': group.id,
+            'name': group.name,
+            'site_ids': [site.id for site in group.sites],
+            'site_numbers': [site.site_number for site in group.sites],
+            'max_occupancy': group.max_occupancy,
+            'max_vehicles': group.max_vehicles,
+            'total_price': group.price_per_night * num_nights
+        } for group in groups]
+    })
+
+
+@bp.route('/api/campgrounds/<int:campground_id>/availability/stream')
+@rate_limited('availability')
+def campground_availability_stream(campground_id):
+    """Server-Sent Events stream of availability changes for a campground"""
+    return availability_stream.stream_response(campground_id)
+
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for this worker (bearer METRICS_TOKEN or admin login)"""
+    token = current_app.config['METRICS_TOKEN']
+    authorized = session.get('admin_logged_in') or (
+        token and request.headers.get('Authorization') == f'Bearer {token}'
+    )
+    if not authorized:
+        abort(401)
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
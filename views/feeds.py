@@ -0,0 +1,62 @@
+"""iCalendar and JSON occupancy feeds for gate staff and partner sync tools"""
+from datetime import datetime
+from flask import Blueprint, abort, current_app, jsonify, request, session
+
+from feeds import Feed, render_feed
+from models import Campground, Site
+from replica import replica_read
+
+bp = Blueprint('feeds', __name__)
+
+CONTENT_TYPES = {
+    'ics': 'text/calendar; charset=utf-8',
+    'json': 'application/json',
+}
+
+
+def feed_authorized():
+    """Admin login, or FEED_TOKEN as ?token= (calendar apps) or a bearer token"""
+    token = current_app.config['FEED_TOKEN']
+    return session.get('admin_logged_in') or (token and (
+        request.args.get('token') == token
+        or request.headers.get('Authorization') == f'Bearer {token}'
+    ))
+
+
+def serve_feed(feed, fmt):
+    """Answer a feed request with a 304, a cached full feed or a since= delta"""
+    if not feed_authorized():
+        abort(401)
+
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({'error': 'since must be an ISO 8601 timestamp'}), 400
+
+    version, cursor = feed.version(since)
+    etag = f'"{version}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if etag in request.headers.get('If-None-Match', ''):
+        return '', 304, headers
+
+    body = render_feed(feed, fmt, version, cursor, since)
+    headers['Content-Type'] = CONTENT_TYPES[fmt]
+    return body, 200, headers
+
+
+@bp.route('/feeds/campgrounds/<int:campground_id>.<any(ics, json):fmt>')
+@replica_read
+def campground_feed(campground_id, fmt):
+    """Confirmed stays and closures for a whole campground"""
+    campground = Campground.query.get_or_404(campground_id)
+    return serve_feed(Feed(campground), fmt)
+
+
+@bp.route('/feeds/sites/<int:site_id>.<any(ics, json):fmt>')
+@replica_read
+def site_feed(site_id, fmt):
+    """Confirmed stays and closures for one site"""
+    site = Site.query.get_or_404(site_id)
+    return serve_feed(Feed(site.campground, site), fmt)
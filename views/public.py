@@ -0,0 +1,414 @@
+"""Public pages: browsing, booking (single sites and groups), payment and the waitlist"""
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, current_app, flash, redirect, render_template, request, url_for
+
+import waitlist
+from events import notify_availability_changed, reservation_changes
+from groups import available_groups
+from holds import release_expired_holds
+from models import db, Campground, Site, SiteGroup, Reservation, WaitlistEntry
+from operations import ReservationConflict, hold_sites
+from payments import create_checkout_session, get_stripe
+from rate_limit import booking_slot, rate_limited
+from replica import pin_to_primary, replica_read
+
+bp = Blueprint('public', __name__)
+
+
+@bp.route('/')
+@replica_read
+def index():
+    """Landing page"""
+    campgrounds = Campground.query.filter_by(active=True).all()
+    return render_template('index.html', campgrounds=campgrounds)
+
+
+@bp.route('/availability')
+@replica_read
+def availability():
+    """Show availability calendar/table"""
+    campground_id = request.args.get('campground', type=int)
+
+    campgrounds = Campground.query.filter_by(active=True).all()
+    selected_campground = None
+    sites = []
+
+    if campground_id:
+        selected_campground = Campground.query.get_or_404(campground_id)
+        sites = Site.query.filter_by(campground_id=campground_id, active=True).all()
+
+    return render_template(
+        'availability.html',
+        campgrounds=campgrounds,
+        selected_campground=selected_campground,
+        sites=sites
+    )
+
+
+@bp.route('/book/<int:site_id>', methods=['GET', 'POST'])
+@rate_limited('booking', methods=('POST',), json_errors=False)
+@booking_slot
+def book(site_id):
+    """Booking form for a specific site"""
+    site = Site.query.get_or_404(site_id)
+
+    if request.method == 'POST':
+        # Get form data
+        arrival = request.form.get('arrival')
+        departure = request.form.get('departure')
+        customer_name = request.form.get('customer_name')
+        customer_email = request.form.get('customer_email')
+        customer_phone = request.form.get('customer_phone')
+        num_occupants = request.form.get('num_occupants', type=int)
+        num_vehicles = request.form.get('num_vehicles', type=int)
+        vehicle_info = request.form.get('vehicle_info', '')
+        special_requests = request.form.get('special_requests', '')
+
+        try:
+            arrival_date = datetime.strptime(arrival, '%Y-%m-%d').date()
+            departure_date = datetime.strptime(departure, '%Y-%m-%d').date()
+
+            # Validate dates
+            if arrival_date >= departure_date:
+                flash('Departure date must be after arrival date.', 'error')
+                return redirect(url_for('public.book', site_id=site_id))
+
+            if arrival_date < datetime.now().date():
+                flash('Cannot book dates in the past.', 'error')
+                return redirect(url_for('public.book', site_id=site_id))
+
+            # Release holds on this site whose checkout window has passed
+            release_expired_holds(site_ids=[site.id])
+
+            # Check availability
+            if not site.is_available(arrival_date, departure_date):
+                flash('Sorry, this site is not available for the selected dates. '
+                      'Join the waitlist and we will hold a site for you if one opens up.', 'error')
+                return redirect(url_for(
+                    'public.waitlist_join', campground=site.campground_id, arrival=arrival, departure=departure
+                ))
+
+            # Calculate total
+            num_nights = (departure_date - arrival_date).days
+            total_amount = site.price_per_night * num_nights
+
+            # Create reservation (pending payment)
+            reservation = Reservation(
+                site_id=site.id,
+                customer_name=customer_name,
+                customer_email=customer_email,
+                customer_phone=customer_phone,
+                arrival_date=arrival_date,
+                departure_date=departure_date,
+                num_nights=num_nights,
+                num_occupants=num_occupants,
+                num_vehicles=num_vehicles,
+                vehicle_info=vehicle_info,
+                special_requests=special_requests,
+                total_amount=total_amount,
+                status='pending',
+                payment_status='pending'
+            )
+
+            db.session.add(reservation)
+            db.session.commit()
+            notify_availability_changed(reservation_changes([reservation], available=False))
+
+            # Create Stripe Checkout Session
+            checkout_session = create_checkout_session(
+                [reservation], datetime.now() + timedelta(minutes=current_app.config['PENDING_HOLD_MINUTES'])
+            )
+
+            # Update reservation with Stripe session ID
+            reservation.stripe_session_id = checkout_session.id
+            db.session.commit()
+            pin_to_primary()
+
+            # Redirect to Stripe Checkout
+            return redirect(checkout_session.url, code=303)
+
+        except ValueError as e:
+            flash(f'Error: {str(e)}', 'error')
+            return redirect(url_for('public.book', site_id=site_id))
+
+    # GET request - show booking form
+    arrival = request.args.get('arrival', '')
+    departure = request.args.get('departure', '')
+
+    return render_template('book.html', site=site, arrival=arrival, departure=departure)
+
+
+@bp.route('/payment/success/<int:reservation_id>')
+def payment_success(reservation_id):
+    """Handle successful payment"""
+    session_id = request.args.get('session_id')
+
+    reservation = Reservation.query.get_or_404(reservation_id)
+
+    # Verify payment with Stripe
+    if session_id:
+        try:
+            checkout_session = get_stripe().checkout.Session.retrieve(session_id)
+
+            if checkout_session.payment_status == 'paid':
+                # Group bookings share one Checkout Session across their reservations
+                reservations = checkout_reservations(reservation)
+
+                # A reload of this page after the booking was confirmed
+                if all(paid.status == 'confirmed' and paid.payment_status == 'paid' for paid in reservations):
+                    return render_template('confirmation.html', reservation=reservation, reservations=reservations)
+
+                # The hold was cancelled (expired, closure, admin) while the guest was paying
+                if any(paid.status != 'pending' for paid in reservations):
+                    return refund_late_payment(reservations, checkout_session)
+
+                for paid in reservations:
+                    paid.payment_status = 'paid'
+                    paid.status = 'confirmed'
+                    paid.stripe_payment_id = checkout_session.payment_intent
+                    waitlist.resolve_offer(paid, 'booked')
+                db.session.commit()
+                pin_to_primary()
+                notify_availability_changed(reservation_changes(reservations, available=False))
+
+                return render_template('confirmation.html', reservation=reservation, reservations=reservations)
+
+        except Exception as e:
+            current_app.logger.error(f"Error verifying payment: {str(e)}")
+            flash('Payment verification failed. Please contact us.', 'error')
+
+    return redirect(url_for('public.index'))
+
+
+def refund_late_payment(reservations, checkout_session):
+    """Flag a payment for a cancelled hold for refund and release the rest of its sites"""
+    released = [held for held in reservations if held.status == 'pending']
+    for held in reservations:
+        held.payment_status = 'refund_due'
+        held.stripe_payment_id = checkout_session.payment_intent
+        held.notes = ((held.notes + '\n') if held.notes else '') + 'Paid after the hold was cancelled; refund due'
+        if held in released:
+            held.status = 'cancelled'
+            waitlist.resolve_offer(held, 'declined')
+    db.session.commit()
+    pin_to_primary()
+    notify_availability_changed(reservation_changes(released, available=True))
+
+    current_app.logger.warning(
+        f"Payment {checkout_session.payment_intent} arrived after reservation(s) "
+        f"{', '.join(str(held.id) for held in reservations)} were cancelled; refund due"
+    )
+    flash('Your payment arrived after this site was released, so the booking could not be completed. '
+          'We will refund your payment in full.', 'error')
+    return redirect(url_for('public.index'))
+
+
+@bp.route('/payment/cancel/<int:reservation_id>')
+def payment_cancel(reservation_id):
+    """Handle cancelled payment"""
+    reservation = Reservation.query.get_or_404(reservation_id)
+    # Only holds still waiting for payment; a paid stay is never cancelled from here
+    reservations = [held for held in checkout_reservations(reservation) if held.status == 'pending']
+
+    # Update reservation status
+    for cancelled in reservations:
+        cancelled.payment_status = 'cancelled'
+        cancelled.status = 'cancelled'
+        waitlist.resolve_offer(cancelled, 'declined')
+    db.session.commit()
+    pin_to_primary()
+    notify_availability_changed(reservation_changes(reservations, available=True))
+
+    flash('Payment was cancelled. Your reservation was not completed.', 'warning')
+    return redirect(url_for('public.availability'))
+
+
+def checkout_reservations(reservation):
+    """All reservations paid through the same Checkout Session as this one"""
+    if not reservation.stripe_session_id:
+        return [reservation]
+    return Reservation.query.filter_by(stripe_session_id=reservation.stripe_session_id).order_by(
+        Reservation.id
+    ).all()
+
+
+@bp.route('/groups')
+@replica_read
+def groups():
+    """Find adjacent site groups that are free for a large party's dates"""
+    campgrounds = Campground.query.filter_by(active=True).all()
+    campground_id = request.args.get('campground', type=int)
+    arrival = request.args.get('arrival', '')
+    departure = request.args.get('departure', '')
+    num_occupants = request.args.get('occupants', 0, type=int)
+
+    results = None
+    if campground_id and arrival and departure:
+        try:
+            arrival_date = datetime.strptime(arrival, '%Y-%m-%d').date()
+            departure_date = datetime.strptime(departure, '%Y-%m-%d').date()
+            if arrival_date >= departure_date:
+                flash('Departure date must be after arrival date.', 'error')
+            else:
+                results = available_groups(campground_id, arrival_date, departure_date, num_occupants)
+        except ValueError:
+            flash('Invalid date format.', 'error')
+
+    return render_template(
+        'groups.html',
+        campgrounds=campgrounds,
+        selected_campground=campground_id,
+        arrival=arrival,
+        departure=departure,
+        num_occupants=num_occupants or '',
+        results=results
+    )
+
+
+@bp.route('/book/group/<int:group_id>', methods=['GET', 'POST'])
+@rate_limited('booking', methods=('POST',), json_errors=False)
+@booking_slot
+def book_group(group_id):
+    """Reserve every site in a group with one checkout"""
+    group = SiteGroup.query.filter_by(id=group_id, active=True).first_or_404()
+
+    if request.method == 'POST':
+        arrival = request.form.get('arrival')
+        departure = request.form.get('departure')
+
+        try:
+            arrival_date = datetime.strptime(arrival, '%Y-%m-%d').date()
+            departure_date = datetime.strptime(departure, '%Y-%m-%d').date()
+
+            if arrival_date < datetime.now().date():
+                flash('Cannot book dates in the past.', 'error')
+                return redirect(url_for('public.book_group', group_id=group_id))
+
+            site_ids = [site.id for site in group.sites]
+            release_expired_holds(site_ids=site_ids)
+
+            # All sites are held in one transaction, or none are
+            reservations = hold_sites(site_ids, arrival_date, departure_date, {
+                'customer_name': request.form.get('customer_name'),
+                'customer_email': request.form.get('customer_email'),
+                'customer_phone': request.form.get('customer_phone'),
+                'num_occupants': request.form.get('num_occupants', type=int),
+                'num_vehicles': request.form.get('num_vehicles', type=int),
+                'vehicle_info': request.form.get('vehicle_info', ''),
+                'special_requests': request.form.get('special_requests', '')
+            })
+            db.session.commit()
+            notify_availability_changed(reservation_changes(reservations, available=False))
+
+        except ReservationConflict:
+            db.session.rollback()
+            flash('Sorry, these sites are no longer all available for the selected dates.', 'error')
+            return redirect(url_for(
+                'public.groups', campground=group.campground_id, arrival=arrival, departure=departure
+            ))
+        except ValueError as e:
+            db.session.rollback()
+            flash(f'Error: {str(e)}', 'error')
+            return redirect(url_for('public.book_group', group_id=group_id, arrival=arrival, departure=departure))
+
+        # One Checkout Session pays for every site in the group
+        checkout_session = create_checkout_session(
+            reservations, datetime.now() + timedelta(minutes=current_app.config['PENDING_HOLD_MINUTES'])
+        )
+        for reservation in reservations:
+            reservation.stripe_session_id = checkout_session.id
+        db.session.commit()
+        pin_to_primary()
+
+        return redirect(checkout_session.url, code=303)
+
+    arrival = request.args.get('arrival', '')
+    departure = request.args.get('departure', '')
+
+    return render_template('book_group.html', group=group, arrival=arrival, departure=departure)
+
+
+@bp.route('/waitlist', methods=['GET', 'POST'])
+def waitlist_join():
+    """Join the waitlist for dates and features at a campground"""
+    campgrounds = Campground.query.filter_by(active=True).all()
+
+    if request.method == 'POST':
+        campground = Campground.query.get_or_404(request.form.get('campground_id', type=int))
+        features = [feature for feature in request.form.getlist('features') if feature in waitlist.FEATURES]
+
+        try:
+            arrival_date = datetime.strptime(request.form.get('arrival'), '%Y-%m-%d').date()
+            departure_date = datetime.strptime(request.form.get('departure'), '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            flash('Please choose valid arrival and departure dates.', 'error')
+            return redirect(url_for('public.waitlist_join', campground=campground.id))
+
+        if arrival_date >= departure_date or arrival_date < datetime.now().date():
+            flash('Please choose future dates with departure after arrival.', 'error')
+            return redirect(url_for('public.waitlist_join', campground=campground.id))
+
+        if (departure_date - arrival_date).days > waitlist.MAX_NIGHTS:
+            flash(f'Waitlist stays are limited to {waitlist.MAX_NIGHTS} nights.', 'error')
+            return redirect(url_for('public.waitlist_join', campground=campground.id))
+
+        entry = WaitlistEntry(
+            token=waitlist.new_token(),
+            campground_id=campground.id,
+            arrival_date=arrival_date,
+            departure_date=departure_date,
+            features=','.join(features),
+            customer_name=request.form.get('customer_name'),
+            customer_email=request.form.get('customer_email'),
+            customer_phone=request.form.get('customer_phone'),
+            num_occupants=request.form.get('num_occupants', type=int),
+            num_vehicles=request.form.get('num_vehicles', type=int)
+        )
+        db.session.add(entry)
+        db.session.commit()
+
+        flash("You're on the waitlist. Bookmark this page to check for an offer.", 'success')
+        return redirect(url_for('public.waitlist_status', token=entry.token))
+
+    return render_template(
+        'waitlist.html',
+        campgrounds=campgrounds,
+        features=waitlist.FEATURES,
+        selected_campground=request.args.get('campground', type=int),
+        arrival=request.args.get('arrival', ''),
+        departure=request.args.get('departure', '')
+    )
+
+
+@bp.route('/waitlist/<token>')
+def waitlist_status(token):
+    """Show a waitlist entry and any site being held for it"""
+    entry = WaitlistEntry.query.filter_by(token=token).first_or_404()
+    return render_template('waitlist_status.html', entry=entry)
+
+
+@bp.route('/waitlist/<token>/checkout', methods=['POST'])
+@rate_limited('booking', methods=('POST',), json_errors=False)
+@booking_slot
+def waitlist_checkout(token):
+    """Pay for a site held by a waitlist offer"""
+    entry = WaitlistEntry.query.filter_by(token=token).first_or_404()
+    reservation = entry.offered_reservation
+
+    if entry.status != 'offered' or entry.offer_expires_at < datetime.utcnow() or reservation.status != 'pending':
+        flash('This offer is no longer available.', 'warning')
+        return redirect(url_for('public.waitlist_status', token=token))
+
+    # Keep the hold for at least as long as Stripe Checkout stays open
+    entry.offer_expires_at = max(
+        entry.offer_expires_at,
+        datetime.utcnow() + timedelta(minutes=current_app.config['PENDING_HOLD_MINUTES'])
+    )
+    checkout_session = create_checkout_session(
+        [reservation], entry.offer_expires_at.replace(tzinfo=timezone.utc)
+    )
+    reservation.stripe_session_id = checkout_session.id
+    db.session.commit()
+    pin_to_primary()
+
+    return redirect(checkout_session.url, code=303)
@@ -0,0 +1,208 @@
+"""Waitlist matching for freed sites
+
+When a reservation is cancelled or expires, the freed dates on that site are
+widened to the surrounding free gap and matched against waiting entries for the
+campground. Stays on the waitlist are capped at MAX_NIGHTS, so an entry that
+overlaps the freed dates arrives at most MAX_NIGHTS before them; entries are
+found with a range scan on the (campground, status, arrival, departure) index
+bounded by that and by the gap, and the oldest entry that fits gets a
+time-limited hold on the site. The site is locked and rechecked against the
+database before each hold, as for any other booking.
+"""
+import secrets
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import update
+
+import availability_cache
+from events import availability_changed, notify_availability_changed, reservation_changes
+from models import db, Reservation, Site, WaitlistEntry
+from operations import HOLD_GRACE_MINUTES, Stay, find_conflicts, lock_sites
+
+# Longest stay a guest can wait for; bounds the arrival range read when matching
+MAX_NIGHTS = 30
+
+# Site features a guest can ask for: (label, text to find, Site attribute to search)
+FEATURES = {
+    'electric': ('Electric hookup', 'Electric', 'site_type'),
+    'pullthru': ('Pull-thru', 'Pull-thru', 'site_type'),
+    'multifamily': ('Multi-family', 'Multi-family', 'notes'),
+    'handicap': ('Handicap accessible', 'Handicap', 'notes'),
+}
+
+
+def new_token():
+    return secrets.token_urlsafe(24)
+
+
+def site_has_features(site, entry):
+    """Check a site against an entry's requested features and party size"""
+    if site.max_occupancy < entry.num_occupants or site.max_vehicles < entry.num_vehicles:
+        return False
+    for feature in entry.feature_list:
+        label, text, attribute = FEATURES[feature]
+        if text not in (getattr(site, attribute) or ''):
+            return False
+    return True
+
+
+def free_gaps(intervals, start, end):
+    """Yield free (gap_start, gap_end) day ordinals overlapping [start, end).
+
+    intervals are the site's merged booked intervals. Gaps extend past the
+    freed range up to the neighbouring bookings; gap_end is None when the site
+    is free indefinitely.
+    """
+    gap_start = date.today().toordinal()
+    for booked_start, booked_end in intervals:
+        if booked_start > gap_start and gap_start < end and booked_start > start:
+            yield gap_start, booked_start
+        gap_start = max(gap_start, booked_end)
+        if gap_start >= end:
+            return
+    yield gap_start, None
+
+
+def match_freed_dates(site, ranges):
+    """Offer holds on a site to waiting entries that fit freed date ranges.
+
+    ranges is a list of (start_date, end_date) pairs freed on the site. Returns
+    the new hold reservations (not yet committed).
+    """
+    # Locked like any booking, so a guest paying for these dates can't race the offer
+    sites = lock_sites([site.id])
+    # Read the primary: the cache may not have been invalidated for this change yet
+    intervals = availability_cache.load_intervals([site.id])[site.id]
+
+    offers = []
+    for start_date, end_date in ranges:
+        for gap_start, gap_end in free_gaps(intervals, start_date.toordinal(), end_date.toordinal()):
+            # Entries that overlap the freed dates and arrive inside the gap: an
+            # index range on arrival_date of at most MAX_NIGHTS before end_date
+            earliest = max(gap_start, (start_date - timedelta(days=MAX_NIGHTS)).toordinal())
+            query = WaitlistEntry.query.filter(
+                WaitlistEntry.campground_id == site.campground_id,
+                WaitlistEntry.status == 'waiting',
+                WaitlistEntry.arrival_date >= date.fromordinal(earliest),
+                WaitlistEntry.arrival_date < end_date,
+                WaitlistEntry.departure_date > start_date
+            )
+            if gap_end is not None:
+                query = query.filter(WaitlistEntry.departure_date <= date.fromordinal(gap_end))
+
+            for entry in query.order_by(WaitlistEntry.created_at).with_for_update(skip_locked=True).all():
+                if not site_has_features(site, entry):
+                    continue
+                # Also catches offers made earlier in this loop (they are flushed)
+                if find_conflicts([Stay(site.id, entry.arrival_date, entry.departure_date, None)], sites):
+                    continue
+                offers.append(offer_hold(entry, site))
+
+    return offers
+
+
+def offer_hold(entry, site):
+    """Hold a site for a waitlist entry until its offer expires"""
+    num_nights = (entry.departure_date - entry.arrival_date).days
+    reservation = Reservation(
+        site_id=site.id,
+        customer_name=entry.customer_name,
+        customer_email=entry.customer_email,
+        customer_phone=entry.customer_phone,
+        arrival_date=entry.arrival_date,
+        departure_date=entry.departure_date,
+        num_nights=num_nights,
+        num_occupants=entry.num_occupants,
+        num_vehicles=entry.num_vehicles,
+        total_amount=site.price_per_night * num_nights,
+        status='pending',
+        payment_status='pending',
+        created_by='waitlist'
+    )
+    db.session.add(reservation)
+    db.session.flush()
+
+    entry.status = 'offered'
+    entry.offered_reservation_id = reservation.id
+    entry.offer_expires_at = datetime.utcnow() + timedelta(minutes=current_app.config['WAITLIST_OFFER_MINUTES'])
+    current_app.logger.info(
+        f"Waitlist entry {entry.id} offered {site.campground.name} site {site.site_number} "
+        f"until {entry.offer_expires_at:%Y-%m-%d %H:%M} UTC"
+    )
+    return reservation
+
+
+def expire_offers(site_ids=None):
+    """Release holds for offers that were not paid in time.
+
+    Returns (id, site_id, arrival_date, departure_date) rows for the released
+    reservations (not yet committed).
+    """
+    now = datetime.utcnow()
+    query = db.session.query(WaitlistEntry.id, WaitlistEntry.offered_reservation_id).filter(
+        WaitlistEntry.status == 'offered',
+        WaitlistEntry.offer_expires_at < now - timedelta(minutes=HOLD_GRACE_MINUTES)
+    )
+    if site_ids:
+        query = query.join(Reservation, Reservation.id == WaitlistEntry.offered_reservation_id).filter(
+            Reservation.site_id.in_(site_ids)
+        )
+    expired = query.all()
+    if not expired:
+        return []
+
+    db.session.execute(
+        update(WaitlistEntry).where(WaitlistEntry.id.in_([row.id for row in expired]))
+        .values(status='expired', updated_at=now),
+        execution_options={'synchronize_session': False}
+    )
+    result = db.session.execute(
+        update(Reservation).where(
+            Reservation.id.in_([row.offered_reservation_id for row in expired]),
+            Reservation.status == 'pending'
+        ).values(status='cancelled', payment_status='expired', updated_at=now).returning(
+            Reservation.id, Reservation.site_id, Reservation.arrival_date, Reservation.departure_date
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    return result.all()
+
+
+def resolve_offer(reservation, status):
+    """Mark the entry behind a waitlist hold as booked or declined"""
+    if reservation.created_by != 'waitlist':
+        return
+    WaitlistEntry.query.filter_by(
+        offered_reservation_id=reservation.id, status='offered'
+    ).update({'status': status, 'updated_at': datetime.utcnow()}, synchronize_session=False)
+
+
+def _on_availability_changed(app, changes):
+    freed = [change for change in changes if change.available]
+    if not freed:
+        return
+
+    ranges = defaultdict(list)
+    for change in freed:
+        ranges[change.site_id].append((change.start_date, change.end_date))
+
+    try:
+        sites = Site.query.filter(Site.id.in_(ranges.keys()), Site.active.is_(True)).all()
+        offers = []
+        for site in sites:
+            offers += match_freed_dates(site, ranges[site.id])
+        db.session.commit()
+    except Exception:
+        # The write that freed the site is already committed; don't fail the request
+        db.session.rollback()
+        app.logger.exception('Waitlist matching failed')
+        return
+
+    notify_availability_changed(reservation_changes(offers, available=False))
+
+
+def init_app(app):
+    app.config.setdefault('WAITLIST_OFFER_MINUTES', 120)
+    availability_changed.connect(_on_availability_changed, app)